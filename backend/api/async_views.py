@@ -0,0 +1,317 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db import connections
+from django.http import (HttpResponse, HttpResponseNotAllowed,
+                         StreamingHttpResponse)
+from django.utils.decorators import classonlymethod
+from django.utils.translation import gettext_lazy as _
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+
+from api.fast_serializers import RecipeFastSerializer
+from api.filters import IngredientFilter, RecipeFilter
+from api.pagination import PagePagination
+from api.renderers import FastJSONRenderer
+from api.throttling import TokenBucketThrottle
+from foodgram.events import get_broker
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.notifications import author_channel, subscriptions_channel
+from users.models import Subscription
+from .serializers import (IngredientSerializer, TagSerialiser,
+                          UserInfoSerializer)
+from .utils import (annotate_is_subscribed, is_public_request,
+                    set_public_cache_control)
+
+
+User = get_user_model()
+
+
+class AsyncReadView(View):
+    """Базовое асинхронное представление для чтения.
+    GET-запросы обрабатываются через async-интерфейс ORM, остальные
+    методы передаются исходному синхронному представлению DRF.
+    """
+
+    sync_view = None
+    shared_cacheable = False
+    renderer = FastJSONRenderer()
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET':
+            return await sync_to_async(self.sync_view)(
+                request, *args, **kwargs
+            )
+        try:
+            request = Request(request)
+            request.user = await self.authenticate(request)
+            await self.check_throttles(request)
+            response = await self.get(request, *args, **kwargs)
+            if self.shared_cacheable:
+                set_public_cache_control(request, response)
+            return response
+        except exceptions.APIException as exc:
+            data = exc.detail
+            if not isinstance(data, (list, dict)):
+                data = {'detail': data}
+            response = self.render(data, exc.status_code)
+            if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+                response['WWW-Authenticate'] = 'Token'
+            if getattr(exc, 'wait', None):
+                response['Retry-After'] = '%d' % exc.wait
+            return response
+
+    async def check_throttles(self, request):
+        throttle = TokenBucketThrottle()
+        if not await sync_to_async(throttle.allow_request)(request, self):
+            raise exceptions.Throttled(throttle.wait())
+
+    async def authenticate(self, request):
+        """Аутентификация по токену, аналог TokenAuthentication."""
+        auth = request.META.get('HTTP_AUTHORIZATION', '').split()
+        if not auth or auth[0].lower() != 'token':
+            return AnonymousUser()
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. No credentials provided.')
+            )
+        try:
+            token = await Token.objects.select_related('user').aget(
+                key=auth[1]
+            )
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        return token.user
+
+    async def get_object(self, queryset, **lookup):
+        try:
+            return await queryset.aget(**lookup)
+        except queryset.model.DoesNotExist:
+            raise exceptions.NotFound(
+                'No %s matches the given query.'
+                % queryset.model._meta.object_name
+            )
+
+    async def filter_queryset(self, request, queryset, filterset_class):
+        filterset = filterset_class(
+            request.query_params, queryset=queryset, request=request
+        )
+        is_valid = await sync_to_async(filterset.is_valid)()
+        if not is_valid:
+            raise exceptions.ValidationError(filterset.errors)
+        return await sync_to_async(lambda: filterset.qs)()
+
+    async def serialize(self, serializer_class, instance, request,
+                        many=False):
+        serializer = serializer_class(
+            instance, many=many, context={
+                'request': request, 'public': is_public_request(request),
+            }
+        )
+        return await sync_to_async(lambda: serializer.data)()
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        return HttpResponse(
+            self.renderer.render(data),
+            content_type='application/json',
+            status=status_code,
+        )
+
+
+class AsyncRecipeListView(AsyncReadView):
+    """Асинхронный список рецептов."""
+
+    throttle_route = 'recipes-list'
+    shared_cacheable = True
+
+    async def get(self, request):
+        serializer = RecipeFastSerializer(
+            request,
+            public=is_public_request(request),
+            fields=request.query_params.get('fields'),
+        )
+        queryset = await self.filter_queryset(
+            request, Recipe.objects.all(), RecipeFilter
+        )
+        paginator = PagePagination()
+        page = await paginator.apaginate_queryset(
+            queryset.values_list('id', flat=True), request
+        )
+        data = await sync_to_async(serializer.serialize)(page)
+        return self.render(paginator.get_paginated_response(data).data)
+
+
+class AsyncRecipeDetailView(AsyncReadView):
+    """Асинхронное получение рецепта."""
+
+    throttle_route = 'recipes-retrieve'
+    shared_cacheable = True
+
+    async def get(self, request, pk):
+        serializer = RecipeFastSerializer(
+            request,
+            public=is_public_request(request),
+            fields=request.query_params.get('fields'),
+        )
+        data = await sync_to_async(serializer.serialize)([pk])
+        if not data:
+            raise exceptions.NotFound(
+                'No %s matches the given query.'
+                % Recipe._meta.object_name
+            )
+        return self.render(data[0])
+
+
+class AsyncTagListView(AsyncReadView):
+    """Асинхронный список тегов."""
+
+    throttle_route = 'tags-list'
+
+    async def get(self, request):
+        tags = [tag async for tag in Tag.objects.all()]
+        return self.render(
+            await self.serialize(TagSerialiser, tags, request, many=True)
+        )
+
+
+class AsyncTagDetailView(AsyncReadView):
+    """Асинхронное получение тега."""
+
+    throttle_route = 'tags-retrieve'
+
+    async def get(self, request, pk):
+        tag = await self.get_object(Tag.objects.all(), pk=pk)
+        return self.render(
+            await self.serialize(TagSerialiser, tag, request)
+        )
+
+
+class AsyncIngredientListView(AsyncReadView):
+    """Асинхронный список ингредиентов."""
+
+    throttle_route = 'ingredients-list'
+
+    async def get(self, request):
+        queryset = await self.filter_queryset(
+            request, Ingredient.objects.all(), IngredientFilter
+        )
+        ingredients = [ingredient async for ingredient in queryset]
+        return self.render(await self.serialize(
+            IngredientSerializer, ingredients, request, many=True
+        ))
+
+
+class AsyncIngredientDetailView(AsyncReadView):
+    """Асинхронное получение ингредиента."""
+
+    throttle_route = 'ingredients-retrieve'
+
+    async def get(self, request, pk):
+        ingredient = await self.get_object(Ingredient.objects.all(), pk=pk)
+        return self.render(
+            await self.serialize(IngredientSerializer, ingredient, request)
+        )
+
+
+class AsyncUserDetailView(AsyncReadView):
+    """Асинхронное получение профиля пользователя."""
+
+    throttle_route = 'subscriptions-retrieve'
+
+    async def get(self, request, id):
+        user = await self.get_object(
+            annotate_is_subscribed(User.objects.all(), request.user), id=id
+        )
+        return self.render(
+            await self.serialize(UserInfoSerializer, user, request)
+        )
+
+
+class AsyncUserMeView(AsyncReadView):
+    """Асинхронное получение профиля текущего пользователя."""
+
+    throttle_route = 'subscriptions-me'
+
+    async def get(self, request):
+        if not request.user.is_authenticated:
+            raise exceptions.NotAuthenticated()
+        request.user.is_subscribed = False
+        return self.render(
+            await self.serialize(UserInfoSerializer, request.user, request)
+        )
+
+
+class RecipeEventsView(AsyncReadView):
+    """Поток server-sent events о новых и измененных рецептах авторов,
+    на которых подписан пользователь. Соединение подписывается на
+    каналы авторов из Subscription и на канал изменений своих подписок;
+    при отсутствии событий отправляются комментарии-heartbeat.
+    """
+
+    throttle_route = 'recipes-events'
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET':
+            return HttpResponseNotAllowed(('GET', ))
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def get(self, request):
+        if not request.user.is_authenticated:
+            raise exceptions.NotAuthenticated()
+        listener = get_broker().listener()
+        listener.listen(
+            subscriptions_channel(request.user.id),
+            lambda message: self.update_subscription(listener, message),
+        )
+        async for author_id in Subscription.objects.filter(
+            user=request.user
+        ).values_list('author_id', flat=True):
+            listener.listen(author_channel(author_id))
+        # Соединение с базой не нужно на время жизни потока.
+        await sync_to_async(connections.close_all)()
+        response = StreamingHttpResponse(
+            self.stream(listener),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def update_subscription(self, listener, message):
+        channel = author_channel(message['author'])
+        if message['subscribed']:
+            listener.listen(channel)
+        else:
+            listener.ignore(channel)
+
+    async def stream(self, listener):
+        try:
+            yield f'retry: {settings.EVENT_RETRY_MILLISECONDS}\n\n'.encode()
+            while True:
+                try:
+                    channel, message = await asyncio.wait_for(
+                        listener.get(), settings.EVENT_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield b': heartbeat\n\n'
+                    continue
+                yield b'event: %s\ndata: %s\n\n' % (
+                    message['event'].encode(),
+                    self.renderer.render(message['data']),
+                )
+        finally:
+            listener.close()
@@ -0,0 +1,226 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework.exceptions import ValidationError
+
+from users.models import Subscription
+from recipes.cache import TieredCache
+from recipes.models import (Favorites, Recipe, RecipeIngredient,
+                            RecipeNutrition, ShoppingCart)
+from recipes.nutrition import NUTRITION_FIELDS
+
+User = get_user_model()
+
+RECIPE_FIELDS = ('id', 'tags', 'author', 'ingredients', 'name', 'image',
+                 'text', 'cooking_time', 'is_favorited', 'is_in_shopping_cart',
+                 'nutrition')
+VIEWER_FIELDS = ('is_favorited', 'is_in_shopping_cart')
+BODY_FIELDS = ('id', 'tags', 'author', 'ingredients', 'name', 'image',
+               'text', 'cooking_time')
+FRAGMENT_KEY = 'recipe-fragment:{}:{}:{}:{}'
+
+
+class RecipeFastSerializer:
+    """Быстрое построение представления рецептов для чтения.
+    Данные страницы собираются из плоских строк values() несколькими
+    запросами, результат совпадает с RecipeGetSerializer. Общие для всех
+    пользователей части рецептов берутся из кэша фрагментов, поля
+    текущего пользователя добавляются при каждом запросе. Параметр
+    fields ограничивает набор полей и пропускает лишние запросы.
+    """
+
+    def __init__(self, request, public=False, fields=None):
+        self.request = request
+        self.user = request.user
+        self.public = public
+        self.sparse = bool(fields)
+        self.fields = self.get_fields(fields)
+
+    def get_fields(self, fields):
+        allowed = tuple(
+            name for name in RECIPE_FIELDS
+            if not (self.public and name in VIEWER_FIELDS)
+        )
+        if not fields:
+            return allowed
+        requested = set(fields.split(','))
+        unknown = requested - set(allowed)
+        if unknown:
+            raise ValidationError(
+                {'fields': f'Неизвестные поля: {", ".join(sorted(unknown))}'}
+            )
+        return tuple(name for name in allowed if name in requested)
+
+    def get_image_url(self, field, name):
+        if not name:
+            return None
+        return self.request.build_absolute_uri(field.storage.url(name))
+
+    def get_tags(self, recipe_ids):
+        tags = defaultdict(list)
+        rows = Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('tag__name').values_list(
+            'recipe_id', 'tag_id', 'tag__name', 'tag__slug'
+        )
+        for recipe_id, tag_id, name, slug in rows:
+            tags[recipe_id].append({'id': tag_id, 'name': name, 'slug': slug})
+        return tags
+
+    def get_ingredients(self, recipe_ids):
+        ingredients = defaultdict(list)
+        rows = RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('recipe', 'id').values_list(
+            'recipe_id', 'ingredient_id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount'
+        )
+        for recipe_id, ingredient_id, name, unit, amount in rows:
+            ingredients[recipe_id].append({
+                'id': ingredient_id,
+                'name': name,
+                'measurement_unit': unit,
+                'amount': amount,
+            })
+        return ingredients
+
+    def get_authors(self, author_ids):
+        avatar = User._meta.get_field('avatar')
+        authors = {}
+        for row in User.objects.filter(id__in=author_ids).values(
+            'id', 'email', 'username', 'first_name', 'last_name', 'avatar'
+        ):
+            row['avatar'] = self.get_image_url(avatar, row['avatar'])
+            authors[row['id']] = row
+        return authors
+
+    def get_subscribed(self, author_ids):
+        if not self.user.is_authenticated:
+            return set()
+        return set(Subscription.objects.filter(
+            user=self.user, author_id__in=author_ids
+        ).values_list('author_id', flat=True))
+
+    def get_user_recipes(self, model, recipe_ids):
+        if not self.user.is_authenticated:
+            return set()
+        return set(model.objects.filter(
+            user=self.user, recipe_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True))
+
+    def get_nutrition(self, recipe_ids):
+        return {
+            row.pop('recipe_id'): row
+            for row in RecipeNutrition.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values('recipe_id', *NUTRITION_FIELDS)
+        }
+
+    def build_bodies(self, recipe_ids, fields):
+        """Общие для всех пользователей части представлений рецептов."""
+        image = Recipe._meta.get_field('image')
+        rows = {
+            row['id']: row
+            for row in Recipe.objects.filter(id__in=recipe_ids).values(
+                'id', 'author_id', 'name', 'image', 'text', 'cooking_time'
+            )
+        }
+        tags = self.get_tags(rows) if 'tags' in fields else {}
+        ingredients = (
+            self.get_ingredients(rows) if 'ingredients' in fields else {}
+        )
+        authors = self.get_authors(
+            {row['author_id'] for row in rows.values()}
+        ) if 'author' in fields else {}
+        values = {
+            'id': lambda row: row['id'],
+            'tags': lambda row: tags.get(row['id'], []),
+            'author': lambda row: authors.get(row['author_id']),
+            'ingredients': lambda row: ingredients.get(row['id'], []),
+            'name': lambda row: row['name'],
+            'image': lambda row: self.get_image_url(image, row['image']),
+            'text': lambda row: row['text'],
+            'cooking_time': lambda row: row['cooking_time'],
+        }
+        getters = [(name, values[name]) for name in fields]
+        return {
+            recipe_id: {name: getter(row) for name, getter in getters}
+            for recipe_id, row in rows.items()
+        }
+
+    def get_cached_bodies(self, recipe_ids):
+        """Тела рецептов из кэша фрагментов по id и версии рецепта."""
+        keys = {
+            recipe_id: FRAGMENT_KEY.format(
+                self.request.scheme, self.request.get_host(),
+                recipe_id, version,
+            )
+            for recipe_id, version in Recipe.objects.filter(
+                id__in=recipe_ids
+            ).values_list('id', 'version')
+        }
+        cached = recipe_fragments.get_many(list(keys.values()))
+        bodies = {
+            recipe_id: cached[key]
+            for recipe_id, key in keys.items() if key in cached
+        }
+        missing = [recipe_id for recipe_id in keys if recipe_id not in bodies]
+        if missing:
+            built = self.build_bodies(missing, BODY_FIELDS)
+            recipe_fragments.set_many({
+                keys[recipe_id]: body for recipe_id, body in built.items()
+            })
+            bodies.update(built)
+        return bodies
+
+    def serialize(self, recipe_ids):
+        """Представления рецептов в порядке переданных id."""
+        fields = self.fields
+        if self.sparse:
+            bodies = self.build_bodies(recipe_ids, [
+                name for name in fields if name in BODY_FIELDS
+            ])
+        else:
+            bodies = self.get_cached_bodies(recipe_ids)
+        recipe_ids = [
+            recipe_id for recipe_id in recipe_ids if recipe_id in bodies
+        ]
+        favorited = (
+            self.get_user_recipes(Favorites, recipe_ids)
+            if 'is_favorited' in fields else set()
+        )
+        in_cart = (
+            self.get_user_recipes(ShoppingCart, recipe_ids)
+            if 'is_in_shopping_cart' in fields else set()
+        )
+        nutrition = (
+            self.get_nutrition(recipe_ids) if 'nutrition' in fields else {}
+        )
+        subscribed = self.get_subscribed({
+            bodies[recipe_id]['author']['id'] for recipe_id in recipe_ids
+        }) if 'author' in fields and not self.public else set()
+        data = []
+        for recipe_id in recipe_ids:
+            item = dict(bodies[recipe_id])
+            if 'author' in item and not self.public:
+                author = dict(item['author'])
+                avatar = author.pop('avatar')
+                author['is_subscribed'] = author['id'] in subscribed
+                author['avatar'] = avatar
+                item['author'] = author
+            if 'is_favorited' in fields:
+                item['is_favorited'] = recipe_id in favorited
+            if 'is_in_shopping_cart' in fields:
+                item['is_in_shopping_cart'] = recipe_id in in_cart
+            if 'nutrition' in fields:
+                item['nutrition'] = nutrition.get(recipe_id)
+            data.append(item)
+        return data
+
+
+recipe_fragments = TieredCache(
+    settings.RECIPE_FRAGMENT_LRU_SIZE,
+    settings.RECIPE_FRAGMENT_CACHE,
+    settings.RECIPE_FRAGMENT_TIMEOUT,
+)
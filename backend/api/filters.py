@@ -1,6 +1,9 @@
+from django.db.models import F
 from django_filters.rest_framework import filters, FilterSet
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Ingredient, MaskBits, Recipe
+from recipes.nutrition import NUTRITION_FIELDS
+from recipes.tag_bits import get_tag_bits, tag_bits
 
 
 class IngredientFilter(FilterSet):
@@ -16,10 +19,13 @@ class IngredientFilter(FilterSet):
 class RecipeFilter(FilterSet):
     """Фильтрация рецептов."""
 
-    tags = filters.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug',
+    tags = filters.MultipleChoiceFilter(
+        choices=lambda: [(slug, slug) for slug in tag_bits.get()],
+        method='get_tags'
+    )
+    tags_match = filters.ChoiceFilter(
+        choices=(('any', 'any'), ('all', 'all')),
+        method='get_tags_match'
     )
     is_favorited = filters.BooleanFilter(
         method='get_is_favorited'
@@ -27,10 +33,36 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
+    ordering = filters.ChoiceFilter(
+        choices=[('popular', 'popular')] + [
+            (value, value)
+            for field in NUTRITION_FIELDS
+            for value in (field, f'-{field}')
+        ],
+        method='get_ordering'
+    )
+    cost = filters.RangeFilter(field_name='nutrition__cost')
+    calories = filters.RangeFilter(field_name='nutrition__calories')
+    proteins = filters.RangeFilter(field_name='nutrition__proteins')
+    fats = filters.RangeFilter(field_name='nutrition__fats')
+    carbohydrates = filters.RangeFilter(
+        field_name='nutrition__carbohydrates'
+    )
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('author', 'tags', 'tags_match', 'is_favorited',
+                  'is_in_shopping_cart', 'ordering') + NUTRITION_FIELDS
+
+    def get_tags(self, queryset, name, value):
+        bits = get_tag_bits(value)
+        queryset = queryset.alias(tag_bits=MaskBits('tags_mask'))
+        if self.form.cleaned_data.get('tags_match') == 'all':
+            return queryset.filter(tag_bits__contains=bits)
+        return queryset.filter(tag_bits__overlap=bits)
+
+    def get_tags_match(self, queryset, name, value):
+        return queryset
 
     def get_is_favorited(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
@@ -41,3 +73,13 @@ class RecipeFilter(FilterSet):
         if self.request.user.is_authenticated and value:
             return queryset.filter(carts__user=self.request.user)
         return queryset
+
+    def get_ordering(self, queryset, name, value):
+        if value == 'popular':
+            return queryset.order_by(
+                F('popularity__score').desc(nulls_last=True), '-pub_date'
+            )
+        field = F(f'nutrition__{value.lstrip("-")}')
+        if value.startswith('-'):
+            return queryset.order_by(field.desc(nulls_last=True), '-pub_date')
+        return queryset.order_by(field.asc(nulls_last=True), '-pub_date')
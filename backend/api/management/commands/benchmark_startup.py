@@ -0,0 +1,67 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+METRICS = ('import', 'first_response', 'warm_response')
+
+
+class Command(BaseCommand):
+    '''Замер времени запуска обработчика в новых процессах.'''
+
+    help = (
+        'Measuring handler import time and time to first response '
+        'in fresh worker processes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--module', default='foodgram.wsgi',
+            help='Module with the application (foodgram.wsgi or '
+                 'foodgram.asgi)',
+        )
+        parser.add_argument(
+            '--path', default='/api/tags/',
+            help='Path of the first request',
+        )
+        parser.add_argument(
+            '--runs', type=int, default=5,
+            help='Number of fresh processes',
+        )
+
+    def handle(self, *args, **options):
+        host = next(
+            (host for host in settings.ALLOWED_HOSTS if host != '*'),
+            'localhost',
+        ).lstrip('.')
+        env = {
+            key: value for key, value in os.environ.items()
+            if key != 'OPTIONAL_APPS'
+        }
+        results = []
+        for run in range(options['runs']):
+            process = subprocess.run(
+                (sys.executable, '-m', 'foodgram.startup',
+                 options['module'], options['path'], host),
+                capture_output=True, text=True, env=env,
+                cwd=settings.BASE_DIR,
+            )
+            if process.returncode:
+                raise CommandError(process.stderr)
+            result = json.loads(process.stdout.splitlines()[-1])
+            results.append(result)
+            self.stdout.write(
+                f'[{run + 1}] status {result["status"]}, ' + ', '.join(
+                    f'{metric} {result[metric] * 1000:.1f} ms'
+                    for metric in METRICS
+                )
+            )
+        self.stdout.write('[!] Median: ' + ', '.join(
+            f'{metric} '
+            f'{statistics.median(r[metric] for r in results) * 1000:.1f} ms'
+            for metric in METRICS
+        ))
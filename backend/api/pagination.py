@@ -1,5 +1,32 @@
-from rest_framework.pagination import PageNumberPagination
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (CursorPagination,
+                                       PageNumberPagination)
 
 
 class PagePagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+    async def apaginate_queryset(self, queryset, request):
+        """Асинхронная пагинация через async-интерфейс ORM."""
+        self.request = request
+        paginator = self.django_paginator_class(
+            queryset, self.get_page_size(request)
+        )
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        self.page.object_list = [
+            obj async for obj in self.page.object_list
+        ]
+        return list(self.page)
+
+
+class FeedPagination(CursorPagination):
+    page_size_query_param = 'limit'
+    ordering = ('-pub_date', '-id')
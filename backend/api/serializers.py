@@ -1,22 +1,80 @@
+import uuid
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
 from django.db import transaction
 from django.contrib.auth import get_user_model
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
 
-from users.models import Subscription
+from recipes.changes import parse_token
 from recipes.models import (Favorites, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingCart, Tag)
+                            RecipeIngredient, RecipeNutrition, ShoppingCart,
+                            Tag, Upload)
+from recipes.nutrition import NUTRITION_FIELDS, schedule_nutrition_update
+from recipes.similarity import index_recipe
+from recipes.uploads import open_upload
 from .utils import get_is_subscribed_value, get_recipe_params
 
 
 User = get_user_model()
 
+VIEWER_STATE_MAX_IDS = 100
+INGREDIENT_SEARCH_MAX_IDS = 100
+UPLOAD_REFERENCE_PREFIX = 'upload:'
+
+
+class ViewerFieldsMixin:
+    """Исключение полей текущего пользователя в публичном режиме."""
+
+    viewer_fields = ()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.context.get('public'):
+            for name in self.viewer_fields:
+                fields.pop(name, None)
+        return fields
+
+
+class ImageUploadField(Base64ImageField):
+    """Поле изображения: строка base64, файл из multipart-запроса
+    или ссылка вида upload:<id> на завершенную загрузку пользователя.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) and data.startswith(UPLOAD_REFERENCE_PREFIX):
+            return serializers.FileField.to_internal_value(
+                self, open_upload(self.get_upload(data))
+            )
+        if isinstance(data, UploadedFile):
+            if data.size > settings.UPLOAD_MAX_SIZE:
+                raise serializers.ValidationError(
+                    f'Размер файла превышает {settings.UPLOAD_MAX_SIZE} байт.'
+                )
+            return serializers.ImageField.to_internal_value(self, data)
+        return super().to_internal_value(data)
+
+    def get_upload(self, reference):
+        try:
+            upload_id = uuid.UUID(reference[len(UPLOAD_REFERENCE_PREFIX):])
+        except ValueError:
+            upload_id = None
+        upload = Upload.objects.filter(
+            id=upload_id, user=self.context['request'].user, completed=True
+        ).first()
+        if upload is None:
+            raise serializers.ValidationError(
+                'Загрузка не найдена или не завершена.'
+            )
+        return upload
 
-class UserInfoSerializer(UserSerializer):
+
+class UserInfoSerializer(ViewerFieldsMixin, UserSerializer):
     """Сериализатор для работы с объектами модели пользователя."""
 
+    viewer_fields = ('is_subscribed', )
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
@@ -40,7 +98,7 @@ class UserRegistrationSerializer(UserCreateSerializer):
 class AvatarUpdateSerializer(serializers.ModelSerializer):
     """Сериализатор работы с полем аватара модели пользователя."""
 
-    avatar = Base64ImageField()
+    avatar = ImageUploadField()
 
     class Meta:
         model = User
@@ -92,41 +150,12 @@ class UserSubscriptionsSerializer(UserInfoSerializer):
         return obj.recipes.all().count()
 
 
-class UserMakeSubscribeSerializer(serializers.ModelSerializer):
-    """Сериализатор для работы с подпиской/отпиской."""
-
-    class Meta:
-        model = Subscription
-        fields = ('author', 'user')
-        validators = (
-            UniqueTogetherValidator(
-                queryset=Subscription.objects.all(),
-                fields=('author', 'user'),
-                message='Подписка на этого пользователя уже оформлена'
-            ),
-        )
-
-    def validate(self, data):
-        author = data.get('author')
-        user = data.get('user')
-        if user == author:
-            raise serializers.ValidationError(
-                {'errors': 'Невозможно оформить подписку на самого себя'}
-            )
-        return data
-
-    def create(self, validated_data):
-        author = validated_data.get('author')
-        user = validated_data.get('user')
-        return Subscription.objects.create(user=user, author=author)
-
-
 class TagSerialiser(serializers.ModelSerializer):
     """Сериализатор для модели тегов."""
 
     class Meta:
         model = Tag
-        fields = '__all__'
+        fields = ('id', 'name', 'slug')
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -134,7 +163,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Ingredient
-        fields = '__all__'
+        fields = ('id', 'name', 'measurement_unit')
 
 
 class IngredientAddSerializer(serializers.ModelSerializer):
@@ -167,9 +196,18 @@ class IngredientGetSerializer(serializers.ModelSerializer):
         )
 
 
-class RecipeGetSerializer(serializers.ModelSerializer):
+class RecipeNutritionSerializer(serializers.ModelSerializer):
+    """Сериализатор стоимости и пищевой ценности рецепта."""
+
+    class Meta:
+        model = RecipeNutrition
+        fields = NUTRITION_FIELDS
+
+
+class RecipeGetSerializer(ViewerFieldsMixin, serializers.ModelSerializer):
     """Сериализатор для получения объектов модели рецептов."""
 
+    viewer_fields = ('is_favorited', 'is_in_shopping_cart')
     tags = TagSerialiser(many=True, read_only=True)
     author = UserInfoSerializer(read_only=True)
     ingredients = IngredientGetSerializer(many=True, read_only=True,
@@ -177,12 +215,13 @@ class RecipeGetSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField()
+    nutrition = RecipeNutritionSerializer(read_only=True)
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients', 'name',
                   'image', 'text', 'cooking_time', 'is_favorited',
-                  'is_in_shopping_cart')
+                  'is_in_shopping_cart', 'nutrition')
 
     def get_is_favorited(self, obj):
         return get_recipe_params(self, obj, Favorites)
@@ -198,7 +237,7 @@ class RecipeAddSerializer(serializers.ModelSerializer):
     tags = serializers.PrimaryKeyRelatedField(required=True,
                                               queryset=Tag.objects.all(),
                                               many=True,)
-    image = Base64ImageField(required=True, use_url=True)
+    image = ImageUploadField(required=True, use_url=True)
 
     class Meta:
         model = Recipe
@@ -255,6 +294,10 @@ class RecipeAddSerializer(serializers.ModelSerializer):
         return instance
 
     def add_ingredients(self, recipe, ingredients_data):
+        index_recipe(
+            recipe, [ingredient.get('id') for ingredient in ingredients_data]
+        )
+        schedule_nutrition_update()
         RecipeIngredient.objects.bulk_create(
             [
                 RecipeIngredient(
@@ -270,45 +313,62 @@ class RecipeAddSerializer(serializers.ModelSerializer):
         return RecipeGetSerializer(instance, context=self.context).data
 
 
-class ShoppingCartSerializer(serializers.ModelSerializer):
-    """Сериализатор для объектов модели списка покупок."""
+class UploadSerializer(serializers.ModelSerializer):
+    """Сериализатор загрузок изображений."""
 
     class Meta:
-        model = ShoppingCart
-        fields = '__all__'
-        validators = (
-            UniqueTogetherValidator(
-                queryset=ShoppingCart.objects.all(),
-                fields=('user', 'recipe'),
-                message='Рецепт уже добавлен в список покупок'
-            ),
-        )
+        model = Upload
+        fields = ('id', 'size', 'offset', 'completed')
+        read_only_fields = ('offset', 'completed')
 
-    def to_representation(self, instance):
-        request = self.context.get('request')
-        return RecipeShortSerializer(
-            instance.recipe,
-            context={'request': request}
-        ).data
+    def validate_size(self, size):
+        if size > settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f'Размер файла превышает {settings.UPLOAD_MAX_SIZE} байт.'
+            )
+        return size
 
 
-class FavoritesSerializer(serializers.ModelSerializer):
-    """Сериализатор для объектов модели избранного."""
+class ChangesQuerySerializer(serializers.Serializer):
+    """Сериализатор параметров запроса журнала изменений."""
 
-    class Meta:
-        model = Favorites
-        fields = '__all__'
-        validators = (
-            UniqueTogetherValidator(
-                queryset=Favorites.objects.all(),
-                fields=('user', 'recipe'),
-                message='Рецепт уже добавлен в избранное'
-            ),
-        )
+    since = serializers.CharField(required=False)
+    limit = serializers.IntegerField(
+        min_value=1, max_value=settings.CHANGES_MAX_PAGE_SIZE,
+        required=False, default=settings.CHANGES_PAGE_SIZE,
+    )
 
-    def to_representation(self, instance):
-        request = self.context.get('request')
-        return RecipeShortSerializer(
-            instance.recipe,
-            context={'request': request}
-        ).data
+    def validate_since(self, since):
+        try:
+            return parse_token(since)
+        except ValueError:
+            raise serializers.ValidationError('Некорректный курсор.')
+
+
+class ViewerStateQuerySerializer(serializers.Serializer):
+    """Сериализатор параметров запроса состояния для пользователя."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(), max_length=VIEWER_STATE_MAX_IDS,
+        required=False, default=list,
+    )
+    authors = serializers.ListField(
+        child=serializers.IntegerField(), max_length=VIEWER_STATE_MAX_IDS,
+        required=False, default=list,
+    )
+
+
+class IngredientSearchQuerySerializer(serializers.Serializer):
+    """Сериализатор параметров поиска рецептов по ингредиентам."""
+
+    have = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False,
+        max_length=INGREDIENT_SEARCH_MAX_IDS,
+    )
+    exclude = serializers.ListField(
+        child=serializers.IntegerField(), required=False, default=list,
+        max_length=INGREDIENT_SEARCH_MAX_IDS,
+    )
+    min_coverage = serializers.FloatField(
+        required=False, default=0, min_value=0, max_value=1
+    )
@@ -0,0 +1,14 @@
+import pytest
+
+from api.serializers import ChangesQuerySerializer
+
+
+def test_cursor_is_parsed():
+    query = ChangesQuerySerializer(data={'since': '7421.15'})
+    assert query.is_valid()
+    assert query.validated_data['since'] == (7421, 15)
+
+
+@pytest.mark.parametrize('since', ('15', '7421.', '-1.2', 'abc'))
+def test_malformed_cursor_is_rejected(since):
+    assert not ChangesQuerySerializer(data={'since': since}).is_valid()
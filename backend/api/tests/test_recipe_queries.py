@@ -0,0 +1,72 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, RecipeNutrition
+from recipes.similarity import index_recipe
+from users.models import Subscription, User
+
+NUTRITION_TABLE = RecipeNutrition._meta.db_table
+
+
+@pytest.fixture
+def author(db):
+    return User.objects.create(username='author', email='a@example.com')
+
+
+@pytest.fixture
+def client(author):
+    reader = User.objects.create(username='reader', email='r@example.com')
+    Subscription.objects.create(user=reader, author=author)
+    client = APIClient()
+    client.force_authenticate(reader)
+    return client
+
+
+def add_recipes(author, count):
+    recipes = []
+    for _ in range(count):
+        recipe = Recipe.objects.create(
+            name='Борщ с пампушками', author=author, text='Сварить',
+            image='recipes/a.jpg', cooking_time=60,
+        )
+        RecipeNutrition.objects.create(
+            recipe=recipe, version=recipe.version, cost=10,
+            calories=0, proteins=0, fats=0, carbohydrates=0,
+        )
+        index_recipe(recipe, [])
+        recipes.append(recipe)
+    return recipes
+
+
+def get(client, path):
+    '''Ответ API и запросы к таблице пищевой ценности,
+    выполненные при его построении.
+    '''
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(path)
+    assert response.status_code == 200
+    return response, [
+        query['sql'] for query in queries
+        if f'FROM "{NUTRITION_TABLE}"' in query['sql']
+    ]
+
+
+def test_feed_joins_nutrition(author, client):
+    add_recipes(author, 3)
+    response, nutrition_queries = get(client, '/api/recipes/feed/')
+    assert nutrition_queries == []
+    assert [
+        item['nutrition']['cost'] for item in response.data['results']
+    ] == [10] * 3
+
+
+def test_similar_joins_nutrition(author, client):
+    recipe, *others = add_recipes(author, 3)
+    response, nutrition_queries = get(
+        client, f'/api/recipes/{recipe.id}/similar/'
+    )
+    assert nutrition_queries == []
+    assert len(response.data) == len(others)
+    assert all(item['nutrition']['cost'] == 10 for item in response.data)
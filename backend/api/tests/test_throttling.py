@@ -0,0 +1,125 @@
+import pytest
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from api.throttling import TokenBucketThrottle
+from foodgram.throttling import (CONCURRENCY_KEY, concurrency_limit_middleware,
+                                 get_throttle_store)
+
+
+@pytest.fixture(autouse=True)
+def store(settings):
+    '''Общее хранилище на кэше в памяти и корзина IP-адреса
+    на 10 жетонов, пополняемая жетоном в секунду.
+    '''
+    settings.THROTTLE_BACKEND = 'foodgram.throttling.CacheStore'
+    settings.THROTTLE_BUCKETS = {'user': (10, 1.0), 'ip': (10, 1.0)}
+    settings.THROTTLE_COSTS = {'recipes-download_shopping_cart': 4}
+    settings.THROTTLE_BYTES_PER_TOKEN = 100
+    get_throttle_store.cache_clear()
+    yield get_throttle_store()
+    get_throttle_store.cache_clear()
+
+
+class ShoppingCartView(APIView):
+    authentication_classes = ()
+    permission_classes = ()
+    throttle_classes = (TokenBucketThrottle, )
+    throttle_route = 'recipes-download_shopping_cart'
+
+    def get(self, request):
+        return Response()
+
+    def post(self, request):
+        return Response()
+
+
+class TagView(ShoppingCartView):
+    throttle_route = 'tags-list'
+
+
+def call(view, method='get', **kwargs):
+    request = getattr(RequestFactory(), method)('/api/', **kwargs)
+    return view.as_view()(request)
+
+
+def test_route_cost():
+    for _ in range(2):
+        assert call(ShoppingCartView).status_code == 200
+    assert call(ShoppingCartView).status_code == 429
+    assert call(TagView).status_code == 200
+
+
+def test_body_size_cost():
+    response = call(
+        TagView, 'post', data='x' * 950, content_type='text/plain'
+    )
+    assert response.status_code == 200
+    assert call(TagView).status_code == 429
+
+
+def test_forwarded_clients_get_own_buckets():
+    proxy = {'REMOTE_ADDR': '172.18.0.5'}
+    for _ in range(10):
+        call(TagView, HTTP_X_FORWARDED_FOR='203.0.113.1', **proxy)
+    response = call(TagView, HTTP_X_FORWARDED_FOR='203.0.113.1', **proxy)
+    assert response.status_code == 429
+    response = call(
+        TagView, HTTP_X_FORWARDED_FOR='198.51.100.7, 203.0.113.1', **proxy
+    )
+    assert response.status_code == 429
+    response = call(TagView, HTTP_X_FORWARDED_FOR='203.0.113.2', **proxy)
+    assert response.status_code == 200
+
+
+def test_throttled_response_has_retry_after():
+    for _ in range(10):
+        call(TagView)
+    response = call(TagView)
+    assert response.status_code == 429
+    assert 1 <= int(response['Retry-After']) <= 2
+
+
+def test_concurrency_limit(settings, store):
+    settings.THROTTLE_CONCURRENCY = 1
+    store.acquire(CONCURRENCY_KEY.format('all'), 1)
+    middleware = concurrency_limit_middleware(lambda request: HttpResponse())
+    response = middleware(RequestFactory().get('/api/tags/'))
+    assert response.status_code == 503
+    assert 'Retry-After' in response
+    store.release(CONCURRENCY_KEY.format('all'))
+    assert middleware(RequestFactory().get('/api/tags/')).status_code == 200
+
+
+def test_concurrency_limit_is_off_by_default(settings):
+    settings.THROTTLE_CONCURRENCY = None
+    settings.THROTTLE_ANON_CONCURRENCY = None
+    with pytest.raises(MiddlewareNotUsed):
+        concurrency_limit_middleware(lambda request: HttpResponse())
+
+
+def test_event_streams_are_not_counted(settings, store):
+    settings.THROTTLE_CONCURRENCY = 1
+    store.acquire(CONCURRENCY_KEY.format('all'), 1)
+    middleware = concurrency_limit_middleware(lambda request: HttpResponse())
+    response = middleware(RequestFactory().get('/api/recipes/events/'))
+    assert response.status_code == 200
+
+
+def test_expired_counter_does_not_drift(store):
+    key = CONCURRENCY_KEY.format('all')
+    assert store.acquire(key, 1)
+    store.cache.delete(key)
+    store.release(key)
+    assert store.cache.get(key) is None
+    assert store.acquire(key, 1)
+    store.cache.delete(key)
+    assert store.acquire(key, 1)
+    store.release(key)
+    store.release(key)
+    assert store.cache.get(key) == 0
+    assert store.acquire(key, 1)
+    assert not store.acquire(key, 1)
@@ -0,0 +1,47 @@
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+from foodgram.throttling import get_throttle_store
+
+
+def get_route(view):
+    """Имя маршрута для THROTTLE_COSTS: basename-action у вьюсетов,
+    throttle_route у остальных представлений.
+    """
+    route = getattr(view, 'throttle_route', None)
+    if route is None and getattr(view, 'basename', None):
+        route = f'{view.basename}-{view.action}'
+    return route or type(view).__name__
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Ограничение частоты запросов корзиной жетонов: авторизованные
+    пользователи расходуют свою корзину, анонимные - корзину
+    IP-адреса. Стоимость запроса берется из THROTTLE_COSTS
+    и растет с размером тела запроса.
+    """
+
+    def get_cost(self, request, view):
+        cost = settings.THROTTLE_COSTS.get(get_route(view), 1)
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        return cost + length // settings.THROTTLE_BYTES_PER_TOKEN
+
+    def allow_request(self, request, view):
+        if request.user and request.user.is_authenticated:
+            scope, ident = 'user', request.user.pk
+        else:
+            scope, ident = 'ip', self.get_ident(request)
+        capacity, rate = settings.THROTTLE_BUCKETS[scope]
+        self.delay = get_throttle_store().take(
+            f'throttle:{scope}:{ident}',
+            min(self.get_cost(request, view), capacity),
+            capacity,
+            rate,
+        )
+        return not self.delay
+
+    def wait(self):
+        return self.delay
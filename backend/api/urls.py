@@ -1,8 +1,11 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from api.views import (AvatarUpdateDeleteView, IngredientViewSet,
-                       RecipeViewSet, SubscriptionsUserViewSet, TagViewSet)
+from api import async_views
+from api.views import (AvatarUpdateDeleteView, ChangesView, IngredientViewSet,
+                       RecipeViewSet, SubscriptionsUserViewSet, TagViewSet,
+                       UploadViewSet)
 
 
 router = DefaultRouter()
@@ -10,10 +13,50 @@ router.register('tags', TagViewSet, basename='tags')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 router.register('users', SubscriptionsUserViewSet, basename='subscriptions')
 router.register('recipes', RecipeViewSet, basename='recipes')
+router.register('uploads', UploadViewSet, basename='uploads')
+
+async_urlpatterns = [
+    path('recipes/events/', async_views.RecipeEventsView.as_view()),
+    path('recipes/', async_views.AsyncRecipeListView.as_view(
+        sync_view=RecipeViewSet.as_view({'get': 'list', 'post': 'create'})
+    )),
+    path('recipes/<int:pk>/', async_views.AsyncRecipeDetailView.as_view(
+        sync_view=RecipeViewSet.as_view({
+            'get': 'retrieve', 'put': 'update',
+            'patch': 'partial_update', 'delete': 'destroy',
+        })
+    )),
+    path('tags/', async_views.AsyncTagListView.as_view(
+        sync_view=TagViewSet.as_view({'get': 'list'})
+    )),
+    path('tags/<int:pk>/', async_views.AsyncTagDetailView.as_view(
+        sync_view=TagViewSet.as_view({'get': 'retrieve'})
+    )),
+    path('ingredients/', async_views.AsyncIngredientListView.as_view(
+        sync_view=IngredientViewSet.as_view({'get': 'list'})
+    )),
+    path('ingredients/<int:pk>/',
+         async_views.AsyncIngredientDetailView.as_view(
+             sync_view=IngredientViewSet.as_view({'get': 'retrieve'})
+         )),
+    path('users/me/', async_views.AsyncUserMeView.as_view(
+        sync_view=SubscriptionsUserViewSet.as_view({'get': 'me'})
+    )),
+    path('users/<int:id>/', async_views.AsyncUserDetailView.as_view(
+        sync_view=SubscriptionsUserViewSet.as_view({
+            'get': 'retrieve', 'put': 'update',
+            'patch': 'partial_update', 'delete': 'destroy',
+        })
+    )),
+]
 
 urlpatterns = [
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
     path('users/me/avatar/', AvatarUpdateDeleteView.as_view(), name='avatar'),
+    path('changes/', ChangesView.as_view(), name='changes'),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = async_urlpatterns + urlpatterns
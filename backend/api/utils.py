@@ -1,14 +1,55 @@
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Value
+from django.utils.cache import patch_cache_control
+
+from users.models import Subscription
+
+PER_USER_FILTERS = ('is_favorited', 'is_in_shopping_cart')
+
+
 def get_is_subscribed_value(self, obj):
-    '''Вспомогательный метод для поля is_subscribed.'''
+    '''Вспомогательный метод для поля is_subscribed.
+    Использует аннотацию is_subscribed, если она есть у объекта.
+    '''
+    if hasattr(obj, 'is_subscribed'):
+        return obj.is_subscribed
     request = self.context.get('request')
     if request and request.user.is_authenticated:
         return obj.subscribers.filter(user=request.user).exists()
     return False
 
 
+def annotate_is_subscribed(queryset, user):
+    '''Аннотация подписки текущего пользователя одним подзапросом.'''
+    if not user.is_authenticated:
+        return queryset.annotate(is_subscribed=Value(False))
+    return queryset.annotate(is_subscribed=Exists(
+        Subscription.objects.filter(user=user, author=OuterRef('pk'))
+    ))
+
+
 def get_recipe_params(self, obj, model):
     '''Вспомогательный метод для поля модели рецептов.'''
     request = self.context.get('request')
     if request is None or request.user.is_anonymous:
         return False
     return model.objects.filter(user=request.user, recipe=obj).exists()
+
+
+def is_public_request(request):
+    '''Запрошено ли представление без полей текущего пользователя.'''
+    return request.query_params.get('public') in ('1', 'true', 'True')
+
+
+def set_public_cache_control(request, response):
+    '''Разрешение общего кэширования ответа в публичном режиме.'''
+    if (
+        request.method == 'GET'
+        and response.status_code == 200
+        and is_public_request(request)
+        and not any(name in request.query_params for name in PER_USER_FILTERS)
+    ):
+        patch_cache_control(
+            response, public=True, max_age=settings.PUBLIC_CACHE_MAX_AGE
+        )
+    return response
@@ -1,26 +1,49 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Sum
-from django.shortcuts import HttpResponse, get_object_or_404
+from django.db.models import Exists, OuterRef, Sum, Value
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import HttpResponse, get_object_or_404, redirect
 from djoser.views import UserViewSet
-from rest_framework import generics, status, viewsets
+from rest_framework import generics, mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import (IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.settings import api_settings
 
+from api.fast_serializers import RecipeFastSerializer
 from api.filters import IngredientFilter, RecipeFilter
+from api.pagination import FeedPagination
 from api.permissions import IsAuthorOrReadOnly
+from foodgram.db import delete_row, insert_ignore
 from foodgram.settings import BASE_URL
+from recipes.changes import format_token, get_changes
+from recipes.deletion import delete_recipe, delete_user
+from recipes.export import export_user_data
+from recipes.feed import get_feed
+from recipes.ingredient_index import ingredient_index
+from recipes.similarity import find_similar
+from recipes.tasks import fan_out
+from recipes.short_links import get_short_code, resolve_short_code
 from recipes.models import (Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag, Favorites)
+                            ShoppingCart, Tag, Favorites, Upload)
+from recipes.uploads import (UploadError, UploadOffsetError, append_chunk,
+                             create_upload_from_file)
 from users.models import Subscription
-from .serializers import (AvatarUpdateSerializer, IngredientSerializer,
-                          FavoritesSerializer, RecipeAddSerializer,
-                          RecipeGetSerializer, ShoppingCartSerializer,
-                          TagSerialiser, UserInfoSerializer,
-                          UserMakeSubscribeSerializer,
-                          UserSubscriptionsSerializer)
+from .serializers import (AvatarUpdateSerializer, ChangesQuerySerializer,
+                          IngredientSerializer,
+                          IngredientSearchQuerySerializer,
+                          RecipeAddSerializer,
+                          RecipeGetSerializer, RecipeShortSerializer,
+                          TagSerialiser, UploadSerializer,
+                          UserInfoSerializer,
+                          UserSubscriptionsSerializer,
+                          ViewerStateQuerySerializer)
+from .utils import (annotate_is_subscribed, is_public_request,
+                    set_public_cache_control)
 
 
 User = get_user_model()
@@ -29,6 +52,14 @@ User = get_user_model()
 class SubscriptionsUserViewSet(UserViewSet):
     """Вьюсет для работы с подписками и профилем."""
 
+    def get_queryset(self):
+        return annotate_is_subscribed(
+            super().get_queryset(), self.request.user
+        )
+
+    def perform_destroy(self, instance):
+        delete_user(instance)
+
     @action(
         detail=False,
         methods=('GET', ),
@@ -36,10 +67,26 @@ class SubscriptionsUserViewSet(UserViewSet):
         permission_classes=(IsAuthenticated,),
     )
     def me(self, request):
+        request.user.is_subscribed = False
         serializer = UserInfoSerializer(request.user)
         return Response(serializer.data,
                         status=status.HTTP_200_OK)
 
+    @action(
+        detail=False,
+        methods=('GET', ),
+        url_path='me/export',
+        permission_classes=(IsAuthenticated,),
+    )
+    def export(self, request):
+        response = StreamingHttpResponse(
+            export_user_data(request.user), content_type='application/zip'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="foodgram-{request.user.username}.zip"'
+        )
+        return response
+
     @action(
         detail=True,
         methods=('POST', 'DELETE'),
@@ -47,26 +94,33 @@ class SubscriptionsUserViewSet(UserViewSet):
         permission_classes=(IsAuthenticated,),
     )
     def subscribe(self, request, id):
-        author = get_object_or_404(User, id=id)
-        serializer = UserMakeSubscribeSerializer(
-            data={'user': request.user.id, 'author': author.id}
-        )
         if request.method == 'POST':
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
+            author = get_object_or_404(User, id=id)
+            if author == request.user:
+                return Response(
+                    {'errors': [
+                        'Невозможно оформить подписку на самого себя'
+                    ]},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if not insert_ignore(
+                Subscription, user=request.user, author=author
+            ):
+                return Response(
+                    {api_settings.NON_FIELD_ERRORS_KEY: [
+                        'Подписка на этого пользователя уже оформлена'
+                    ]},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             serializer = UserSubscriptionsSerializer(
                 author, context={'request': request})
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        subscription = Subscription.objects.filter(
-            user=request.user,
-            author=author
-        )
-        if not subscription.exists():
+        if not delete_row(Subscription, user=request.user, author_id=id):
+            get_object_or_404(User, id=id)
             return Response(
                 {'errors': 'Подписка на этого пользователя не оформлена'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        subscription.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -76,7 +130,9 @@ class SubscriptionsUserViewSet(UserViewSet):
         permission_classes=(IsAuthenticated,),
     )
     def subscriptions(self, request):
-        queryset = User.objects.filter(subscribers__user=request.user)
+        queryset = User.objects.filter(
+            subscribers__user=request.user
+        ).annotate(is_subscribed=Value(True))
         pages = self.paginate_queryset(queryset)
         serializer = UserSubscriptionsSerializer(
             pages,
@@ -102,6 +158,72 @@ class AvatarUpdateDeleteView(generics.UpdateAPIView, generics.DestroyAPIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class UploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                    mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """Вьюсет потоковой загрузки изображений.
+    POST с файлом в поле file (multipart) принимает изображение целиком,
+    POST с размером size создает возобновляемую загрузку, части которой
+    передаются запросами PATCH с заголовком Upload-Offset. Завершенная
+    загрузка указывается в поле изображения как upload:<id>.
+    """
+
+    serializer_class = UploadSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        return Upload.objects.filter(user=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        if request.content_type.startswith('multipart/'):
+            file = request.FILES.get('file')
+            if file is None:
+                return Response(
+                    {'file': 'Обязательное поле.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            try:
+                upload = create_upload_from_file(request.user, file)
+            except UploadError as error:
+                return Response(
+                    {'errors': str(error)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return Response(
+                self.get_serializer(upload).data,
+                status=status.HTTP_201_CREATED
+            )
+        return super().create(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    def partial_update(self, request, *args, **kwargs):
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers['Content-Length'])
+        except (KeyError, ValueError):
+            return Response(
+                {'errors': 'Укажите заголовки Upload-Offset '
+                           'и Content-Length.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            upload = append_chunk(
+                self.get_object(), request.stream, offset, length
+            )
+        except UploadOffsetError as error:
+            return Response(
+                {'errors': str(error)}, status=status.HTTP_409_CONFLICT
+            )
+        except UploadError as error:
+            return Response(
+                {'errors': str(error)}, status=status.HTTP_400_BAD_REQUEST
+            )
+        response = Response(self.get_serializer(upload).data)
+        response['Upload-Offset'] = upload.offset
+        return response
+
+
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     """Вьюсет для работы с тегами."""
 
@@ -137,35 +259,172 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeGetSerializer
         return RecipeAddSerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['public'] = is_public_request(self.request)
+        return context
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if self.action in ('list', 'retrieve'):
+            set_public_cache_control(request, response)
+        return response
+
+    def get_fast_serializer(self):
+        return RecipeFastSerializer(
+            self.request,
+            public=is_public_request(self.request),
+            fields=self.request.query_params.get('fields'),
+        )
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_fast_serializer()
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset.values_list('id', flat=True))
+        return self.get_paginated_response(serializer.serialize(page))
+
+    def retrieve(self, request, *args, **kwargs):
+        serializer = self.get_fast_serializer()
+        try:
+            recipe_ids = list(self.filter_queryset(
+                self.get_queryset()
+            ).filter(pk=kwargs['pk']).values_list('id', flat=True))
+        except (TypeError, ValueError, ValidationError):
+            recipe_ids = []
+        if not recipe_ids:
+            raise Http404(
+                'No %s matches the given query.' % Recipe._meta.object_name
+            )
+        return Response(serializer.serialize(recipe_ids)[0])
+
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        fan_out.enqueue(recipe_id=recipe.id, key=f'fan-out:{recipe.id}')
+
+    def perform_destroy(self, instance):
+        delete_recipe(instance)
 
     @staticmethod
-    def add_recipe_to_cart_or_favorite(request, recipe, serializer):
-        serializer = serializer(
-            data={'user': request.user.id, 'recipe': recipe.id},
-            context={'request': request}
+    def add_recipe_to_cart_or_favorite(request, model, pk, error):
+        recipe = get_object_or_404(Recipe, id=pk)
+        if not insert_ignore(model, user=request.user, recipe=recipe):
+            return Response(
+                {api_settings.NON_FIELD_ERRORS_KEY: [error]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = RecipeShortSerializer(
+            recipe, context={'request': request}
         )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @staticmethod
-    def delete_recipe_from_cart_or_favorite(request, model, recipe, error):
-        if not model.objects.filter(user=request.user,
-                                    recipe=recipe).exists():
+    def delete_recipe_from_cart_or_favorite(request, model, pk, error):
+        if not delete_row(model, user=request.user, recipe_id=pk):
+            get_object_or_404(Recipe, id=pk)
             return Response(
                 {'errors': error},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        model.objects.filter(user=request.user, recipe=recipe).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        detail=False,
+        methods=('GET',),
+        permission_classes=(IsAuthenticated,),
+        pagination_class=FeedPagination,
+    )
+    def feed(self, request):
+        queryset = get_feed(request.user).select_related(
+            'author', 'nutrition'
+        ).prefetch_related('tags', 'recipe_ingredients__ingredient')
+        pages = self.paginate_queryset(queryset)
+        serializer = RecipeGetSerializer(
+            pages,
+            many=True,
+            context={'request': request}
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=('GET',),
+        permission_classes=(IsAuthenticated,),
+    )
+    def state(self, request):
+        query = ViewerStateQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        recipes = Recipe.objects.filter(
+            id__in=query.validated_data['recipes']
+        ).annotate(
+            is_favorited=Exists(Favorites.objects.filter(
+                user=request.user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=request.user, recipe=OuterRef('pk')
+            )),
+        ).order_by().values('id', 'is_favorited', 'is_in_shopping_cart')
+        subscribed = set(Subscription.objects.filter(
+            user=request.user,
+            author_id__in=query.validated_data['authors'],
+        ).values_list('author_id', flat=True))
+        return Response({
+            'recipes': list(recipes),
+            'authors': [
+                {'id': author_id, 'is_subscribed': author_id in subscribed}
+                for author_id in query.validated_data['authors']
+            ],
+        })
+
+    @action(detail=False, methods=('GET',), url_path='by-ingredients')
+    def by_ingredients(self, request):
+        query = IngredientSearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        recipe_ids, coverages = ingredient_index.search(
+            **query.validated_data
+        )
+        coverages = dict(zip(recipe_ids, coverages))
+        page = self.paginate_queryset(recipe_ids)
+        recipes = Recipe.objects.select_related(
+            'author', 'nutrition'
+        ).prefetch_related(
+            'tags', 'recipe_ingredients__ingredient'
+        ).in_bulk(page)
+        data = RecipeGetSerializer(
+            [recipes[recipe_id] for recipe_id in page if recipe_id in recipes],
+            many=True,
+            context=self.get_serializer_context()
+        ).data
+        for item in data:
+            item['coverage'] = round(coverages[item['id']], 4)
+        return self.get_paginated_response(data)
+
+    @action(detail=True, methods=('GET',))
+    def similar(self, request, pk=None):
+        similar = find_similar(self.get_object())[
+            :settings.SIMILAR_RECIPES_LIMIT
+        ]
+        recipes = Recipe.objects.select_related(
+            'author', 'nutrition'
+        ).prefetch_related(
+            'tags', 'recipe_ingredients__ingredient'
+        ).in_bulk([recipe_id for recipe_id, _ in similar])
+        data = RecipeGetSerializer(
+            [recipes[recipe_id] for recipe_id, _ in similar
+             if recipe_id in recipes],
+            many=True,
+            context=self.get_serializer_context()
+        ).data
+        scores = dict(similar)
+        for item in data:
+            item['similarity'] = round(scores[item['id']], 4)
+        return Response(data)
+
     @action(detail=True, url_path='get-link')
     def get_link(self, request, pk=None):
-        recipe_id = self.kwargs[self.lookup_field]
-        short_link = f'{BASE_URL}recipes/{recipe_id}/'
-        return Response({'short-link': short_link})
+        code = get_short_code(self.get_object())
+        return Response({'short-link': f'{BASE_URL}s/{code}/'})
 
     @action(
         detail=True,
@@ -174,12 +433,13 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=(IsAuthenticated,)
     )
     def shopping_cart(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
         if request.method == 'POST':
-            return self.add_recipe_to_cart_or_favorite(request, recipe,
-                                                       ShoppingCartSerializer)
+            return self.add_recipe_to_cart_or_favorite(
+                request, ShoppingCart, pk,
+                'Рецепт уже добавлен в список покупок'
+            )
         return self.delete_recipe_from_cart_or_favorite(
-            request, ShoppingCart, recipe,
+            request, ShoppingCart, pk,
             'Данный рецепт не содержится в списке покупок'
         )
 
@@ -190,7 +450,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def download_shopping_cart(self, request):
         ingredients = RecipeIngredient.objects.filter(
-            recipe__carts__user=request.user
+            recipe__carts__user=request.user,
+            recipe__deleted_at__isnull=True,
         ).values(
             'ingredient__name', 'ingredient__measurement_unit'
         ).annotate(ingredient_amount=Sum('amount'))
@@ -211,11 +472,63 @@ class RecipeViewSet(viewsets.ModelViewSet):
         methods=('POST', 'DELETE',),
     )
     def favorite(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
         if request.method == 'POST':
-            return self.add_recipe_to_cart_or_favorite(request, recipe,
-                                                       FavoritesSerializer)
+            return self.add_recipe_to_cart_or_favorite(
+                request, Favorites, pk, 'Рецепт уже добавлен в избранное'
+            )
         return self.delete_recipe_from_cart_or_favorite(
-            request, Favorites, recipe,
+            request, Favorites, pk,
             'Данный рецепт не содержится в избранном'
         )
+
+
+class ChangesView(APIView):
+    """Изменения рецептов, избранного, списка покупок и подписок
+    после курсора since. Рецепты возвращаются целиком, остальное -
+    списками id; удаленные объекты перечисляются в deleted. Ответ
+    с reset=true означает, что клиенту нужна полная синхронизация,
+    после которой изменения запрашиваются с полученного token.
+    """
+
+    def get(self, request):
+        query = ChangesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        changes, token, has_more = get_changes(
+            request.user,
+            query.validated_data.get('since'),
+            query.validated_data['limit'],
+        )
+        data = {'token': format_token(token), 'has_more': has_more,
+                'reset': changes is None}
+        for kind, objects in (changes or {}).items():
+            data[kind] = {
+                'upserted': [
+                    object_id for object_id, deleted in objects.items()
+                    if not deleted
+                ],
+                'deleted': [
+                    object_id for object_id, deleted in objects.items()
+                    if deleted
+                ],
+            }
+        if changes is not None and data['recipe']['upserted']:
+            recipes = RecipeFastSerializer(request).serialize(
+                data['recipe']['upserted']
+            )
+            found = {recipe['id'] for recipe in recipes}
+            data['recipe'] = {
+                'upserted': recipes,
+                'deleted': data['recipe']['deleted'] + [
+                    recipe_id for recipe_id in data['recipe']['upserted']
+                    if recipe_id not in found
+                ],
+            }
+        return Response(data)
+
+
+def short_link_redirect(request, code):
+    """Переход по короткой ссылке на страницу рецепта."""
+    recipe_id = resolve_short_code(code)
+    if recipe_id is None:
+        raise Http404
+    return redirect(f'{BASE_URL}recipes/{recipe_id}/')
@@ -0,0 +1,13 @@
+import pytest
+from django.core.cache import caches
+
+
+@pytest.fixture(autouse=True)
+def local_cache(settings):
+    '''Тесты работают в одном процессе, поэтому кэш в памяти процесса
+    здесь допустим; между тестами он очищается.
+    '''
+    settings.SHARED_CACHE_REQUIRED = False
+    yield
+    for cache in caches.all():
+        cache.clear()
@@ -1,7 +1,8 @@
 import os
 
-from django.core.asgi import get_asgi_application
+from foodgram.handlers import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+os.environ.setdefault('ASYNC_READ_VIEWS', 'True')
 
 application = get_asgi_application()
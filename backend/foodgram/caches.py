@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+
+PROCESS_LOCAL_CACHES = (DummyCache, LocMemCache)
+
+
+def get_shared_cache(alias, setting):
+    """Кэш alias, который должен быть общим для всех процессов.
+    Кэш в памяти процесса при SHARED_CACHE_REQUIRED считается ошибкой
+    конфигурации: каждый обработчик gunicorn видел бы только свои
+    записи. setting - имя настройки, выбравшей кэш, для сообщения.
+    """
+    cache = caches[alias]
+    if (
+        settings.SHARED_CACHE_REQUIRED
+        and isinstance(cache, PROCESS_LOCAL_CACHES)
+    ):
+        raise ImproperlyConfigured(
+            f'{setting} = {alias!r} указывает на кэш в памяти процесса. '
+            'Задайте REDIS_URL или другой общий кэш в CACHES.'
+        )
+    return cache
@@ -0,0 +1,317 @@
+import csv
+import datetime
+import gzip
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connections, models, transaction
+
+DATASET_APPS = ('users', 'recipes')
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+MEDIA_DIR = 'media'
+NULL = r'\N'
+COMPRESS_LEVEL = 3
+
+
+def dataset_levels():
+    """Модели выгружаемых приложений, сгруппированные по уровням
+    зависимостей: таблицы уровня ссылаются только на таблицы
+    предыдущих уровней. Автоматические m2m-таблицы, ссылающиеся
+    на модели других приложений (группы и права пользователей),
+    не выгружаются.
+    """
+    dataset = {
+        model for label in DATASET_APPS
+        for model in apps.get_app_config(label).get_models(
+            include_auto_created=True
+        )
+        if model._meta.managed and not model._meta.proxy
+    }
+    dependencies = {}
+    for model in dataset:
+        related = {
+            field.related_model for field in model._meta.concrete_fields
+            if field.is_relation and field.related_model is not model
+        }
+        if related <= dataset:
+            dependencies[model] = related
+    levels = []
+    while dependencies:
+        level = sorted(
+            (
+                model for model, related in dependencies.items()
+                if not related & dependencies.keys()
+            ),
+            key=lambda model: model._meta.label,
+        )
+        if not level:
+            raise ValueError('Circular dependency between dataset tables.')
+        levels.append(level)
+        for model in level:
+            del dependencies[model]
+    return levels
+
+
+def encode(field, value):
+    """Значение поля в текстовом виде, который понимает COPY."""
+    if value is None:
+        return NULL
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (bytes, memoryview)):
+        return '\\x' + bytes(value).hex()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(field, models.JSONField):
+        return json.dumps(value, cls=field.encoder)
+    return str(value)
+
+
+def decode(field, value):
+    if value == NULL:
+        return None
+    if isinstance(field, models.BinaryField):
+        return bytes.fromhex(value[2:])
+    if isinstance(field, models.JSONField):
+        return json.loads(value, cls=field.decoder)
+    return field.to_python(value)
+
+
+def table_path(directory, model):
+    return os.path.join(directory, f'{model._meta.db_table}.csv.gz')
+
+
+def copy_media(source, target_dir, name):
+    """Копирование файла из хранилища в каталог выгрузки."""
+    path = os.path.join(target_dir, MEDIA_DIR, name)
+    if not name or os.path.exists(path) or not source.exists(name):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with source.open(name) as stream, open(path, 'wb') as target:
+        for chunk in stream.chunks():
+            target.write(chunk)
+
+
+@contextmanager
+def snapshot(using):
+    """Транзакция основного потока, снимок которой разделяют потоки
+    выгрузки, чтобы все таблицы были выгружены согласованно.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        yield None
+        return
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        cursor.execute('SELECT pg_export_snapshot()')
+        yield cursor.fetchone()[0]
+
+
+def dump_table(model, directory, using, snapshot_id, media):
+    connection = connections[using]
+    fields = model._meta.concrete_fields
+    file_fields = [
+        index for index, field in enumerate(fields)
+        if media and isinstance(field, models.FileField)
+    ]
+    count = 0
+    try:
+        with transaction.atomic(using=using):
+            if snapshot_id is not None:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SET TRANSACTION ISOLATION LEVEL REPEATABLE READ'
+                    )
+                    cursor.execute(
+                        'SET TRANSACTION SNAPSHOT %s', [snapshot_id]
+                    )
+            rows = model._base_manager.using(using).order_by().values_list(
+                *(field.attname for field in fields)
+            )
+            with gzip.open(
+                table_path(directory, model), 'wt', encoding='utf-8',
+                newline='', compresslevel=COMPRESS_LEVEL,
+            ) as stream:
+                writer = csv.writer(stream)
+                writer.writerow(field.column for field in fields)
+                for row in rows.iterator(
+                    chunk_size=settings.DATASET_CHUNK_SIZE
+                ):
+                    writer.writerow(
+                        encode(field, value)
+                        for field, value in zip(fields, row)
+                    )
+                    for index in file_fields:
+                        copy_media(
+                            fields[index].storage, directory, row[index]
+                        )
+                    count += 1
+    finally:
+        connection.close()
+    return count
+
+
+def dump_dataset(directory, using='default', jobs=1, media=False):
+    """Выгрузка таблиц приложений users и recipes в каталог: по
+    сжатому CSV-файлу на таблицу и manifest.json с порядком загрузки.
+    Таблицы выгружаются параллельно в jobs потоков.
+    """
+    os.makedirs(directory, exist_ok=True)
+    levels = dataset_levels()
+    dataset = [model for level in levels for model in level]
+    with snapshot(using) as snapshot_id, ThreadPoolExecutor(jobs) as pool:
+        counts = list(pool.map(
+            lambda model: dump_table(
+                model, directory, using, snapshot_id, media
+            ),
+            dataset,
+        ))
+    manifest = {
+        'version': FORMAT_VERSION,
+        'media': media,
+        'levels': [
+            [model._meta.label for model in level] for level in levels
+        ],
+        'tables': {
+            model._meta.label: {
+                'file': os.path.basename(table_path(directory, model)),
+                'columns': [
+                    field.column for field in model._meta.concrete_fields
+                ],
+                'rows': count,
+            }
+            for model, count in zip(dataset, counts)
+        },
+    }
+    with open(os.path.join(directory, MANIFEST), 'w') as stream:
+        json.dump(manifest, stream, indent=2)
+    return manifest
+
+
+def copy_table(connection, model, columns, stream):
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            'COPY {} ({}) FROM STDIN WITH (FORMAT csv, HEADER true, '
+            "NULL '{}')".format(
+                quote(model._meta.db_table),
+                ', '.join(quote(column) for column in columns),
+                NULL,
+            ),
+            stream,
+        )
+
+
+def insert_table(model, columns, stream, using):
+    fields_by_column = {
+        field.column: field for field in model._meta.concrete_fields
+    }
+    fields = [fields_by_column[column] for column in columns]
+    reader = csv.reader(stream)
+    next(reader)
+    batch = []
+    for row in reader:
+        batch.append(model(**{
+            field.attname: decode(field, value)
+            for field, value in zip(fields, row)
+        }))
+        if len(batch) == settings.DATASET_CHUNK_SIZE:
+            model._base_manager.using(using).bulk_create(batch)
+            batch = []
+    model._base_manager.using(using).bulk_create(batch)
+
+
+def restore_table(model, directory, table, using):
+    connection = connections[using]
+    try:
+        with transaction.atomic(using=using), gzip.open(
+            os.path.join(directory, table['file']), 'rt',
+            encoding='utf-8', newline='',
+        ) as stream:
+            if connection.vendor == 'postgresql':
+                copy_table(connection, model, table['columns'], stream)
+            else:
+                insert_table(model, table['columns'], stream, using)
+    finally:
+        connection.close()
+    return table['rows']
+
+
+def truncate_tables(dataset, using):
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('TRUNCATE {} CASCADE'.format(', '.join(
+                connection.ops.quote_name(model._meta.db_table)
+                for model in dataset
+            )))
+        return
+    with transaction.atomic(using=using):
+        for model in reversed(dataset):
+            model._base_manager.using(using).all()._raw_delete(using)
+
+
+def restore_media(directory):
+    """Копирование файлов выгрузки в хранилище без перезаписи
+    уже существующих.
+    """
+    root = os.path.join(directory, MEDIA_DIR)
+    for path, _, files in os.walk(root):
+        for filename in files:
+            source = os.path.join(path, filename)
+            name = os.path.relpath(source, root).replace(os.sep, '/')
+            if default_storage.exists(name):
+                continue
+            with open(source, 'rb') as stream:
+                default_storage.save(name, File(stream))
+
+
+def restore_dataset(directory, using='default', jobs=1, truncate=False,
+                    media=False):
+    """Загрузка выгрузки dump_dataset. Уровни зависимостей загружаются
+    по очереди, таблицы одного уровня и файлы - параллельно. После
+    загрузки последовательности первичных ключей сдвигаются за
+    загруженные значения.
+    """
+    with open(os.path.join(directory, MANIFEST)) as stream:
+        manifest = json.load(stream)
+    if manifest['version'] != FORMAT_VERSION:
+        raise ValueError(
+            f'Unsupported dataset format version {manifest["version"]}.'
+        )
+    levels = [
+        [apps.get_model(label) for label in level]
+        for level in manifest['levels']
+    ]
+    dataset = [model for level in levels for model in level]
+    if truncate:
+        truncate_tables(dataset, using)
+    count = 0
+    with ThreadPoolExecutor(jobs) as pool:
+        media_restored = (
+            pool.submit(restore_media, directory)
+            if media and manifest['media'] else None
+        )
+        for level in levels:
+            count += sum(pool.map(
+                lambda model: restore_table(
+                    model, directory,
+                    manifest['tables'][model._meta.label], using,
+                ),
+                level,
+            ))
+        if media_restored is not None:
+            media_restored.result()
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), dataset):
+            cursor.execute(sql)
+    return count
@@ -0,0 +1,191 @@
+import hashlib
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections, router
+from django.db.models.signals import post_delete, post_save
+from django.utils.decorators import sync_and_async_middleware
+
+from .caches import get_shared_cache
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_CACHE_KEY = 'db-primary-pin:{}'
+
+routing_state = ContextVar('routing_state', default=None)
+
+
+class RoutingState:
+    """Состояние маршрутизации запросов к БД в рамках одного запроса."""
+
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.written = False
+
+
+class ReplicaRouter:
+    """Маршрутизатор: чтение безопасных запросов API идет на реплики,
+    запись и чтение после записи - на основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = routing_state.get()
+        if state is None or not state.use_replica or state.written:
+            return 'default'
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = routing_state.get()
+        if state is not None:
+            state.written = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+def get_pin_key(request):
+    """Ключ закрепления клиента за основной базой после записи.
+    Закрепляются только запросы с токеном: анонимные клиенты за
+    прокси неотличимы друг от друга, и одна анонимная запись
+    перевела бы на основную базу всех анонимных читателей.
+    """
+    identity = request.META.get('HTTP_AUTHORIZATION')
+    if not identity:
+        return None
+    return PIN_CACHE_KEY.format(
+        hashlib.sha256(identity.encode()).hexdigest()
+    )
+
+
+def is_replica_candidate(request):
+    return (
+        request.method in SAFE_METHODS
+        and request.path.startswith('/api/')
+    )
+
+
+@sync_and_async_middleware
+def replica_routing_middleware(get_response):
+    """Включает чтение с реплик для безопасных запросов к API.
+    После записи клиент с токеном на DATABASE_REPLICA_PIN_SECONDS
+    читает из основной базы (read-your-writes). Метка закрепления хранится
+    в общем кэше DATABASE_REPLICA_PIN_CACHE, чтобы следующий запрос
+    клиента учел ее в любом процессе.
+    """
+
+    if not settings.DATABASE_REPLICAS:
+        raise MiddlewareNotUsed
+    cache = get_shared_cache(
+        settings.DATABASE_REPLICA_PIN_CACHE, 'DATABASE_REPLICA_PIN_CACHE'
+    )
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            pin_key = get_pin_key(request)
+            use_replica = (
+                is_replica_candidate(request)
+                and not (pin_key and await cache.aget(pin_key))
+            )
+            state = RoutingState(use_replica)
+            token = routing_state.set(state)
+            try:
+                response = await get_response(request)
+            finally:
+                routing_state.reset(token)
+            if state.written and pin_key:
+                await cache.aset(
+                    pin_key, True, settings.DATABASE_REPLICA_PIN_SECONDS
+                )
+            return response
+    else:
+        def middleware(request):
+            pin_key = get_pin_key(request)
+            use_replica = (
+                is_replica_candidate(request)
+                and not (pin_key and cache.get(pin_key))
+            )
+            state = RoutingState(use_replica)
+            token = routing_state.set(state)
+            try:
+                response = get_response(request)
+            finally:
+                routing_state.reset(token)
+            if state.written and pin_key:
+                cache.set(
+                    pin_key, True, settings.DATABASE_REPLICA_PIN_SECONDS
+                )
+            return response
+
+    return middleware
+
+
+def insert_ignore(model, **values):
+    """Вставка строки одним запросом INSERT ... ON CONFLICT DO NOTHING.
+    Возвращает True, если строка добавлена, и False при нарушении
+    уникальности; для добавленной строки отправляется post_save.
+    """
+    instance = model(**values)
+    connection = connections[router.db_for_write(model)]
+    quote_name = connection.ops.quote_name
+    fields = [
+        field for field in model._meta.local_concrete_fields
+        if field is not model._meta.auto_field
+    ]
+    params = [
+        field.get_db_prep_save(field.pre_save(instance, True), connection)
+        for field in fields
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO {} ({}) VALUES ({}) ON CONFLICT DO NOTHING'.format(
+                quote_name(model._meta.db_table),
+                ', '.join(quote_name(field.column) for field in fields),
+                ', '.join(['%s'] * len(fields)),
+            ),
+            params,
+        )
+        inserted = cursor.rowcount == 1
+    if inserted:
+        post_save.send(
+            sender=model, instance=instance, created=True,
+            update_fields=None, raw=False, using=connection.alias,
+        )
+    return inserted
+
+
+def delete_row(model, **values):
+    """Удаление строки по уникальному ключу одним запросом DELETE
+    без предварительной выборки. Возвращает True, если строка
+    удалена; для удаленной строки отправляется post_delete.
+    """
+    instance = model(**values)
+    connection = connections[router.db_for_write(model)]
+    quote_name = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in values]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'DELETE FROM {} WHERE {}'.format(
+                quote_name(model._meta.db_table),
+                ' AND '.join(
+                    f'{quote_name(field.column)} = %s' for field in fields
+                ),
+            ),
+            [
+                field.get_db_prep_value(
+                    getattr(instance, field.attname), connection
+                )
+                for field in fields
+            ],
+        )
+        deleted = cursor.rowcount > 0
+    if deleted:
+        post_delete.send(
+            sender=model, instance=instance, using=connection.alias,
+            origin=instance,
+        )
+    return deleted
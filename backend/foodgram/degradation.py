@@ -0,0 +1,263 @@
+import hashlib
+import re
+import threading
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import OperationalError
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, JsonResponse
+from django.utils.decorators import sync_and_async_middleware
+
+from .caches import get_shared_cache
+from .db import SAFE_METHODS
+
+STALE_CACHE_KEY = 'stale-response:{}'
+
+degradation_state = ContextVar('degradation_state', default=None)
+
+
+class DegradationState:
+    """Состояние запроса: лимит времени запросов к БД и признак
+    ошибки базы во время его обработки.
+    """
+
+    def __init__(self, statement_timeout):
+        self.statement_timeout = statement_timeout
+        self.configured = set()
+        self.db_failed = False
+
+
+class CircuitBreaker:
+    """Предохранитель процесса: размыкается после threshold ошибок БД
+    подряд и не пропускает запросы reset_seconds секунд. После этого
+    запросы снова идут в базу, но первая же ошибка размыкает его
+    заново; успешный запрос сбрасывает счетчик.
+    """
+
+    def __init__(self, threshold, reset_seconds):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        opened_at = self.opened_at
+        return (
+            opened_at is not None
+            and time.monotonic() - opened_at < self.reset_seconds
+        )
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+    def record_success(self):
+        if self.failures:
+            with self.lock:
+                self.failures = 0
+                self.opened_at = None
+
+
+circuit_breaker = CircuitBreaker(
+    settings.CIRCUIT_BREAKER_THRESHOLD,
+    settings.CIRCUIT_BREAKER_RESET_SECONDS,
+)
+
+
+@lru_cache(maxsize=None)
+def get_timeout_routes():
+    return [
+        (re.compile(pattern), timeout)
+        for pattern, timeout in settings.DB_STATEMENT_TIMEOUTS
+    ]
+
+
+def get_statement_timeout(path):
+    """Лимит времени запроса к БД в миллисекундах для пути; 0 - без
+    ограничения.
+    """
+    for pattern, timeout in get_timeout_routes():
+        if pattern.match(path):
+            return timeout
+    return 0
+
+
+def guard_execute(execute, sql, params, many, context):
+    """Обертка выполнения запросов: выставляет statement_timeout
+    маршрута один раз на соединение за запрос, при DB_SLOWDOWN_MS
+    искусственно замедляет базу и сообщает предохранителю об
+    успехах и ошибках.
+    """
+    state = degradation_state.get()
+    connection = context['connection']
+    try:
+        if connection.vendor == 'postgresql':
+            with connection.wrap_database_errors:
+                cursor = context['cursor'].cursor
+                if (
+                    state is not None
+                    and id(connection.connection) not in state.configured
+                ):
+                    cursor.execute(
+                        'SET statement_timeout = %s',
+                        [state.statement_timeout],
+                    )
+                    state.configured.add(id(connection.connection))
+                if settings.DEBUG and settings.DB_SLOWDOWN_MS:
+                    cursor.execute(
+                        'SELECT pg_sleep(%s)',
+                        [settings.DB_SLOWDOWN_MS / 1000],
+                    )
+        result = execute(sql, params, many, context)
+    except OperationalError:
+        circuit_breaker.record_failure()
+        if state is not None:
+            state.db_failed = True
+        raise
+    circuit_breaker.record_success()
+    return result
+
+
+def install_guard(sender, connection, **kwargs):
+    if guard_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(guard_execute)
+
+
+@lru_cache(maxsize=None)
+def get_stale_routes():
+    return [re.compile(pattern) for pattern in settings.STALE_RESPONSE_ROUTES]
+
+
+def get_stale_key(request):
+    return STALE_CACHE_KEY.format(hashlib.sha256(
+        request.get_full_path().encode()
+    ).hexdigest())
+
+
+def is_stale_candidate(request):
+    """Чтение общедоступных данных из STALE_RESPONSE_ROUTES, которое
+    можно отдать из сохраненной копии.
+    """
+    return request.method in SAFE_METHODS and any(
+        pattern.match(request.path) for pattern in get_stale_routes()
+    )
+
+
+def is_cacheable(request, response):
+    """Сохраняется только анонимный вариант ответа: он один на путь
+    и не содержит данных конкретного пользователя.
+    """
+    return (
+        'HTTP_AUTHORIZATION' not in request.META
+        and response.status_code == 200
+        and not response.streaming
+    )
+
+
+def pack_response(response):
+    return (
+        response.content, response.get('Content-Type'), time.time()
+    )
+
+
+def stale_response(cached):
+    """Последний удачный ответ с заголовками устаревания или 503,
+    если сохраненного ответа нет.
+    """
+    if cached is None:
+        return unavailable_response()
+    content, content_type, stored_at = cached
+    response = HttpResponse(content, content_type=content_type)
+    response['Age'] = int(time.time() - stored_at)
+    response['Warning'] = '110 - "Response is Stale"'
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def unavailable_response():
+    response = JsonResponse(
+        {'detail': 'Сервис временно недоступен, повторите позже.'},
+        status=503,
+    )
+    response['Retry-After'] = settings.CIRCUIT_BREAKER_RESET_SECONDS
+    return response
+
+
+@sync_and_async_middleware
+def degraded_mode_middleware(get_response):
+    """Работа при деградации базы.
+    Запросы получают statement_timeout по DB_STATEMENT_TIMEOUTS.
+    Пока предохранитель разомкнут, чтение STALE_RESPONSE_ROUTES
+    отдается из последних удачных анонимных ответов, а остальные
+    запросы сразу получают 503; ответ чтения, сорвавшийся из-за
+    ошибки базы, тоже заменяется сохраненным. Копии хранятся в общем
+    кэше STALE_RESPONSE_CACHE, чтобы их видели все процессы.
+    """
+
+    connection_created.connect(install_guard, dispatch_uid='db-guard')
+    stale_cache = get_shared_cache(
+        settings.STALE_RESPONSE_CACHE, 'STALE_RESPONSE_CACHE'
+    )
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            stale = is_stale_candidate(request)
+            if circuit_breaker.is_open:
+                if not stale:
+                    return unavailable_response()
+                return stale_response(
+                    await stale_cache.aget(get_stale_key(request))
+                )
+            state = DegradationState(get_statement_timeout(request.path))
+            token = degradation_state.set(state)
+            try:
+                response = await get_response(request)
+            finally:
+                degradation_state.reset(token)
+            if not stale:
+                return response
+            if state.db_failed and response.status_code >= 500:
+                return stale_response(
+                    await stale_cache.aget(get_stale_key(request))
+                )
+            if is_cacheable(request, response):
+                await stale_cache.aset(
+                    get_stale_key(request), pack_response(response),
+                    settings.STALE_RESPONSE_TIMEOUT,
+                )
+            return response
+    else:
+        def middleware(request):
+            stale = is_stale_candidate(request)
+            if circuit_breaker.is_open:
+                if not stale:
+                    return unavailable_response()
+                return stale_response(
+                    stale_cache.get(get_stale_key(request))
+                )
+            state = DegradationState(get_statement_timeout(request.path))
+            token = degradation_state.set(state)
+            try:
+                response = get_response(request)
+            finally:
+                degradation_state.reset(token)
+            if not stale:
+                return response
+            if state.db_failed and response.status_code >= 500:
+                return stale_response(stale_cache.get(get_stale_key(request)))
+            if is_cacheable(request, response):
+                stale_cache.set(
+                    get_stale_key(request), pack_response(response),
+                    settings.STALE_RESPONSE_TIMEOUT,
+                )
+            return response
+
+    return middleware
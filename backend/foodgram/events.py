@@ -0,0 +1,174 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+from collections import defaultdict, deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Listener:
+    """Получатель событий одного соединения.
+    Сообщения хранятся в очереди ограниченного размера: при отставании
+    клиента самые старые из них отбрасываются. Сообщения каналов,
+    для которых задан обработчик, не ставятся в очередь, а сразу
+    передаются обработчику в цикле событий соединения.
+    """
+
+    def __init__(self, broker, maxsize):
+        self.broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.messages = deque(maxlen=maxsize)
+        self.ready = asyncio.Event()
+        self.channels = {}
+
+    def listen(self, channel, handler=None):
+        if channel not in self.channels:
+            self.broker.add(channel, self)
+        self.channels[channel] = handler
+
+    def ignore(self, channel):
+        if channel in self.channels:
+            del self.channels[channel]
+            self.broker.remove(channel, self)
+
+    def close(self):
+        for channel in list(self.channels):
+            self.ignore(channel)
+
+    def deliver(self, channel, message):
+        """Передача сообщения из любого потока в цикл событий соединения."""
+        try:
+            self.loop.call_soon_threadsafe(self.put, channel, message)
+        except RuntimeError:
+            self.close()
+
+    def put(self, channel, message):
+        if channel not in self.channels:
+            return
+        handler = self.channels[channel]
+        if handler is not None:
+            handler(message)
+            return
+        self.messages.append((channel, message))
+        self.ready.set()
+
+    async def get(self):
+        while not self.messages:
+            self.ready.clear()
+            await self.ready.wait()
+        return self.messages.popleft()
+
+
+class InProcessBroker:
+    """Публикация событий подписчикам внутри одного процесса.
+    Подходит только для разработки в одном процессе; брокер для
+    нескольких процессов (PostgresBroker) подключается через
+    настройку EVENT_BROKER и реализует те же методы publish, add
+    и remove.
+    """
+
+    def __init__(self):
+        self.channels = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def add(self, channel, listener):
+        with self.lock:
+            self.channels[channel].add(listener)
+
+    def remove(self, channel, listener):
+        with self.lock:
+            listeners = self.channels.get(channel)
+            if listeners is not None:
+                listeners.discard(listener)
+                if not listeners:
+                    del self.channels[channel]
+
+    def publish(self, channel, message):
+        with self.lock:
+            listeners = list(self.channels.get(channel, ()))
+        for listener in listeners:
+            listener.deliver(channel, message)
+
+    def listener(self):
+        return Listener(self, settings.EVENT_QUEUE_SIZE)
+
+
+class PostgresBroker(InProcessBroker):
+    """Брокер поверх LISTEN/NOTIFY PostgreSQL: событие, опубликованное
+    любым процессом (например, обработчиком WSGI после записи),
+    получают слушатели во всех процессах. Процесс слушает канал
+    EVENT_PG_CHANNEL в отдельном потоке с собственным соединением,
+    который запускается при первой подписке и переподключается
+    после ошибок.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.listening = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def add(self, channel, listener):
+        super().add(channel, listener)
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.listen, name='event-broker', daemon=True
+                )
+                self.thread.start()
+
+    def publish(self, channel, message):
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [
+                settings.EVENT_PG_CHANNEL,
+                json.dumps({'channel': channel, 'message': message}),
+            ])
+
+    def listen(self):
+        database = connections[DEFAULT_DB_ALIAS]
+        while not self.stopping.is_set():
+            connection = None
+            try:
+                connection = database.get_new_connection(
+                    database.get_connection_params()
+                )
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'LISTEN ' + database.ops.quote_name(
+                            settings.EVENT_PG_CHANNEL
+                        )
+                    )
+                self.listening.set()
+                while not self.stopping.is_set():
+                    select.select(
+                        [connection], [], [], settings.EVENT_PG_POLL_SECONDS
+                    )
+                    connection.poll()
+                    while connection.notifies:
+                        event = json.loads(connection.notifies.pop(0).payload)
+                        super().publish(event['channel'], event['message'])
+            except Exception:
+                logger.exception('Event listener connection failed')
+                self.listening.clear()
+                self.stopping.wait(settings.EVENT_PG_POLL_SECONDS)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+    def close(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.EVENT_BROKER)()
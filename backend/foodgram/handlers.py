@@ -0,0 +1,74 @@
+import django
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.base import BaseHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.test.utils import override_settings
+
+
+def is_api_request(request):
+    return request.path_info.startswith('/api/')
+
+
+class APIHandler(BaseHandler):
+    """Обработчик запросов к API: цепочка из API_MIDDLEWARE без
+    сессий, CSRF и сообщений (API аутентифицирует только по токену)
+    и отдельный API_URLCONF без админки.
+    """
+
+    def load_middleware(self, is_async=False):
+        """Сборка цепочки из API_MIDDLEWARE штатным
+        BaseHandler.load_middleware: он читает только
+        settings.MIDDLEWARE, поэтому настройка подменяется на время
+        этого вызова. Цепочка собирается один раз при создании
+        обработчика, до приема запросов.
+        """
+        with override_settings(MIDDLEWARE=settings.API_MIDDLEWARE):
+            super().load_middleware(is_async)
+
+    def get_response(self, request):
+        request.urlconf = settings.API_URLCONF
+        return super().get_response(request)
+
+    async def get_response_async(self, request):
+        request.urlconf = settings.API_URLCONF
+        return await super().get_response_async(request)
+
+
+class APIPipelineMixin:
+    """Направляет запросы к /api/ в APIHandler, остальные - в полную
+    цепочку MIDDLEWARE.
+    """
+
+    def load_middleware(self, is_async=False):
+        super().load_middleware(is_async)
+        self.api_handler = APIHandler()
+        self.api_handler.load_middleware(is_async)
+
+    def get_response(self, request):
+        if is_api_request(request):
+            return self.api_handler.get_response(request)
+        return super().get_response(request)
+
+    async def get_response_async(self, request):
+        if is_api_request(request):
+            return await self.api_handler.get_response_async(request)
+        return await super().get_response_async(request)
+
+
+class PipelineWSGIHandler(APIPipelineMixin, WSGIHandler):
+    pass
+
+
+class PipelineASGIHandler(APIPipelineMixin, ASGIHandler):
+    pass
+
+
+def get_wsgi_application():
+    django.setup(set_prefix=False)
+    return PipelineWSGIHandler()
+
+
+def get_asgi_application():
+    django.setup(set_prefix=False)
+    return PipelineASGIHandler()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -15,10 +16,12 @@ DEBUG = os.getenv('DEBUG_VALUE') == 'True'
 
 ALLOWED_HOSTS = str(os.getenv('ALLOWED_HOSTS')).split()
 
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS') == 'True'
+
 AUTH_USER_MODEL = 'users.User'
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    'django.contrib.admin.apps.SimpleAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -26,15 +29,18 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'recipes.apps.RecipesConfig',
     'users.apps.UsersConfig',
+    'jobs.apps.JobsConfig',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
     'django_filters',
     'api.apps.ApiConfig',
-    'django_extensions',
-]
+] + os.getenv('OPTIONAL_APPS', '').split()
 
 MIDDLEWARE = [
+    'foodgram.degradation.degraded_mode_middleware',
+    'foodgram.throttling.concurrency_limit_middleware',
+    'foodgram.db.replica_routing_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -44,8 +50,18 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+API_MIDDLEWARE = [
+    'foodgram.degradation.degraded_mode_middleware',
+    'foodgram.throttling.concurrency_limit_middleware',
+    'foodgram.db.replica_routing_middleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
 ROOT_URLCONF = 'foodgram.urls'
 
+API_URLCONF = 'foodgram.api_urls'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -71,10 +87,48 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0)),
+    }
+}
+
+DATABASE_REPLICAS = []
+
+for index, replica_host in enumerate(
+    os.getenv('DB_REPLICA_HOSTS', '').split(), start=1
+):
+    replica_host, _, replica_port = replica_host.partition(':')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': replica_port or DATABASES['default']['PORT'],
+        'CONN_MAX_AGE': int(os.getenv('DB_REPLICA_CONN_MAX_AGE', 60)),
+        'TEST': {'MIRROR': 'default'},
     }
+    DATABASE_REPLICAS.append(f'replica_{index}')
+
+DATABASE_ROUTERS = ['foodgram.db.ReplicaRouter']
+
+DATABASE_REPLICA_PIN_SECONDS = int(
+    os.getenv('DATABASE_REPLICA_PIN_SECONDS', 10)
+)
+DATABASE_REPLICA_PIN_CACHE = 'default'
+
+REDIS_URL = os.getenv('REDIS_URL')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
 }
 
+SHARED_CACHE_REQUIRED = os.getenv(
+    'SHARED_CACHE_REQUIRED', str(not DEBUG)
+) == 'True'
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -124,6 +178,136 @@ DJOSER = {
     }
 }
 
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', 10000))
+FEED_BACKFILL_SIZE = int(os.getenv('FEED_BACKFILL_SIZE', 100))
+FEED_BATCH_SIZE = 1000
+
+POPULAR_WINDOW_DAYS = int(os.getenv('POPULAR_WINDOW_DAYS', 7))
+POPULAR_HALF_LIFE_HOURS = int(os.getenv('POPULAR_HALF_LIFE_HOURS', 48))
+
+SHORT_LINK_CACHE_SIZE = int(os.getenv('SHORT_LINK_CACHE_SIZE', 10000))
+SHORT_LINK_FLUSH_HITS = 100
+SHORT_LINK_FLUSH_SECONDS = 30
+
+PUBLIC_CACHE_MAX_AGE = int(os.getenv('PUBLIC_CACHE_MAX_AGE', 60))
+
+TAG_BITS_TTL = 60
+TAG_BITS_CACHE = 'default'
+
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', 30))
+INGREDIENT_INDEX_REBUILD_SECONDS = 3600
+INGREDIENT_INDEX_CHUNK_SIZE = 10000
+
+NUTRITION_CHUNK_SIZE = 5000
+NUTRITION_UPDATE_DELAY = int(os.getenv('NUTRITION_UPDATE_DELAY', 60))
+
+MINHASH_SEED = 20241112
+MINHASH_BANDS = 16
+MINHASH_ROWS = 4
+SIMILARITY_THRESHOLD = float(os.getenv('SIMILARITY_THRESHOLD', 0.3))
+DUPLICATE_THRESHOLD = float(os.getenv('DUPLICATE_THRESHOLD', 0.8))
+SIMILAR_RECIPES_LIMIT = 6
+
+RECIPE_FRAGMENT_LRU_SIZE = int(os.getenv('RECIPE_FRAGMENT_LRU_SIZE', 5000))
+RECIPE_FRAGMENT_CACHE = os.getenv('RECIPE_FRAGMENT_CACHE')
+RECIPE_FRAGMENT_TIMEOUT = 24 * 60 * 60
+
+UPLOAD_TEMP_DIR = os.getenv(
+    'UPLOAD_TEMP_DIR', os.path.join(tempfile.gettempdir(), 'foodgram-uploads')
+)
+UPLOAD_MAX_SIZE = int(os.getenv('UPLOAD_MAX_SIZE', 10 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+UPLOAD_EXPIRE_HOURS = int(os.getenv('UPLOAD_EXPIRE_HOURS', 24))
+UPLOAD_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF')
+
+JOBS_EAGER = os.getenv('JOBS_EAGER') == 'True'
+JOB_QUEUES = {
+    'default': int(os.getenv('JOB_DEFAULT_CONCURRENCY', 4)),
+    'feed': int(os.getenv('JOB_FEED_CONCURRENCY', 2)),
+    'cleanup': int(os.getenv('JOB_CLEANUP_CONCURRENCY', 1)),
+}
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_SECONDS = 10
+JOB_RETRY_MAX_SECONDS = 60 * 60
+JOB_HEARTBEAT_SECONDS = 15
+JOB_TIMEOUT_SECONDS = 2 * 60
+JOB_POLL_SECONDS = 1
+
+CHANGES_PAGE_SIZE = 500
+CHANGES_MAX_PAGE_SIZE = 1000
+CHANGE_LOG_RETENTION_DAYS = int(os.getenv('CHANGE_LOG_RETENTION_DAYS', 30))
+CHANGE_LOG_BATCH_SIZE = 1000
+
+EVENT_BROKER = os.getenv('EVENT_BROKER', 'foodgram.events.PostgresBroker')
+EVENT_PG_CHANNEL = 'foodgram_events'
+EVENT_PG_POLL_SECONDS = 1
+EVENT_QUEUE_SIZE = 100
+EVENT_HEARTBEAT_SECONDS = 15
+EVENT_RETRY_MILLISECONDS = 5000
+
+DATASET_CHUNK_SIZE = 5000
+
+EXPORT_CHUNK_SIZE = 500
+
+DELETION_BATCH_SIZE = 500
+DELETION_BATCHES_PER_JOB = 20
+
+SHOPPING_CART_MAX_AGE_DAYS = int(
+    os.getenv('SHOPPING_CART_MAX_AGE_DAYS', 30)
+)
+
+DB_STATEMENT_TIMEOUTS = (
+    (r'^/api/recipes/(download_shopping_cart|by-ingredients)/', 5000),
+    (r'^/api/(recipes|changes)/', 2000),
+    (r'^/api/', 1000),
+)
+DB_SLOWDOWN_MS = int(os.getenv('DB_SLOWDOWN_MS', 0))
+CIRCUIT_BREAKER_THRESHOLD = 5
+CIRCUIT_BREAKER_RESET_SECONDS = 30
+STALE_RESPONSE_CACHE = 'default'
+STALE_RESPONSE_ROUTES = (
+    r'^/api/(recipes|tags|ingredients)/(\d+/)?$',
+)
+STALE_RESPONSE_TIMEOUT = 24 * 60 * 60
+
+# Число прокси перед приложением: адрес клиента берется из
+# X-Forwarded-For, который nginx перезаписывает адресом соединения.
+NUM_PROXIES = int(os.getenv('NUM_PROXIES', 1))
+THROTTLE_BACKEND = os.getenv(
+    'THROTTLE_BACKEND',
+    'foodgram.throttling.CacheStore' if SHARED_CACHE_REQUIRED
+    else 'foodgram.throttling.InProcessStore',
+)
+THROTTLE_CACHE = 'default'
+THROTTLE_STORE_SIZE = 100_000
+THROTTLE_BUCKETS = {
+    'user': (120, 2.0),
+    'ip': (60, 1.0),
+}
+THROTTLE_COSTS = {
+    'recipes-download_shopping_cart': 20,
+    'recipes-create': 10,
+    'recipes-update': 10,
+    'recipes-partial_update': 10,
+    'recipes-by_ingredients': 5,
+    'subscriptions-export': 50,
+    'ingredients-list': 5,
+}
+THROTTLE_BYTES_PER_TOKEN = 256 * 1024
+# Лимиты одновременных запросов включаются только явно: подходящее
+# значение зависит от числа экземпляров и типа обработчиков.
+THROTTLE_CONCURRENCY = (
+    int(os.getenv('THROTTLE_CONCURRENCY'))
+    if os.getenv('THROTTLE_CONCURRENCY') else None
+)
+THROTTLE_ANON_CONCURRENCY = (
+    int(os.getenv('THROTTLE_ANON_CONCURRENCY'))
+    if os.getenv('THROTTLE_ANON_CONCURRENCY') else None
+)
+THROTTLE_CONCURRENCY_EXEMPT_PATHS = ('/api/recipes/events/', )
+THROTTLE_CONCURRENCY_TTL = 60
+THROTTLE_CONCURRENCY_RETRY_AFTER = 1
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
@@ -133,6 +317,16 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
 
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.TokenBucketThrottle',
+    ],
+    'NUM_PROXIES': NUM_PROXIES,
+
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.PagePagination',
     'PAGE_SIZE': 6,
 }
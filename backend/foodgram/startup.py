@@ -0,0 +1,73 @@
+"""Замер запуска обработчика в новом процессе.
+Модуль не импортирует Django до начала замера и запускается как
+python -m foodgram.startup <модуль> <путь> <хост>.
+"""
+import asyncio
+import importlib
+import io
+import json
+import sys
+import time
+from wsgiref.util import setup_testing_defaults
+
+
+def call_wsgi(application, path, host):
+    environ = {'PATH_INFO': path, 'HTTP_HOST': host}
+    setup_testing_defaults(environ)
+    environ['wsgi.input'] = io.BytesIO()
+    statuses = []
+    body = application(
+        environ, lambda status, headers: statuses.append(status)
+    )
+    for _ in body:
+        pass
+    body.close()
+    return int(statuses[0].split()[0])
+
+
+def call_asgi(application, path, host):
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'root_path': '',
+        'query_string': b'',
+        'headers': [(b'host', host.encode())],
+        'client': ('127.0.0.1', 0),
+        'server': (host, 80),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    return messages[0]['status']
+
+
+def measure(module, path, host):
+    started = time.perf_counter()
+    application = importlib.import_module(module).application
+    imported = time.perf_counter()
+    call = call_asgi if module.endswith('asgi') else call_wsgi
+    status = call(application, path, host)
+    responded = time.perf_counter()
+    call(application, path, host)
+    warm = time.perf_counter()
+    return {
+        'import': imported - started,
+        'first_response': responded - imported,
+        'warm_response': warm - responded,
+        'status': status,
+    }
+
+
+if __name__ == '__main__':
+    print(json.dumps(measure(*sys.argv[1:4])))
@@ -0,0 +1,96 @@
+import pytest
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from foodgram.db import replica_routing_middleware
+from recipes.models import Recipe
+
+AUTHOR = 'Token author'
+READER = 'Token reader'
+
+
+@pytest.fixture
+def replicas(settings):
+    settings.DATABASE_REPLICAS = ['replica_1']
+    settings.DATABASE_REPLICA_PIN_SECONDS = 60
+
+
+def make_worker():
+    '''Цепочка из middleware и представления, которое записывает
+    базу, выбранную для чтения; при POST представление пишет.
+    Несколько цепочек моделируют обработчики gunicorn.
+    '''
+    used = []
+
+    def view(request):
+        if request.method == 'POST':
+            router.db_for_write(Recipe)
+        used.append(router.db_for_read(Recipe))
+        return HttpResponse()
+
+    return replica_routing_middleware(view), used
+
+
+def request(method, path='/api/recipes/', authorization=AUTHOR):
+    return getattr(RequestFactory(), method)(
+        path, HTTP_AUTHORIZATION=authorization
+    )
+
+
+def test_safe_api_reads_use_replica(replicas):
+    worker, used = make_worker()
+    worker(request('get'))
+    assert used == ['replica_1']
+
+
+def test_non_api_and_unsafe_requests_use_primary(replicas):
+    worker, used = make_worker()
+    worker(request('get', path='/admin/'))
+    worker(request('post'))
+    assert used == ['default', 'default']
+
+
+def test_write_pins_client_to_primary(replicas):
+    worker, used = make_worker()
+    worker(request('post'))
+    worker(request('get'))
+    worker(request('get', authorization=READER))
+    assert used == ['default', 'default', 'replica_1']
+
+
+def test_pin_is_seen_by_other_workers(replicas):
+    writer, _ = make_worker()
+    reader, used = make_worker()
+    writer(request('post'))
+    reader(request('get'))
+    assert used == ['default']
+
+
+def test_pin_expires(replicas, settings):
+    settings.DATABASE_REPLICA_PIN_SECONDS = 0
+    worker, used = make_worker()
+    worker(request('post'))
+    worker(request('get'))
+    assert used == ['default', 'replica_1']
+
+
+def test_process_local_pin_cache_is_rejected(replicas, settings):
+    settings.SHARED_CACHE_REQUIRED = True
+    with pytest.raises(ImproperlyConfigured):
+        make_worker()
+
+
+def test_middleware_is_skipped_without_replicas(settings):
+    settings.DATABASE_REPLICAS = []
+    with pytest.raises(MiddlewareNotUsed):
+        make_worker()
+
+
+def test_anonymous_writes_do_not_pin(replicas):
+    writer, _ = make_worker()
+    reader, used = make_worker()
+    writer(request('post', authorization=''))
+    reader(request('get', authorization=''))
+    assert used == ['replica_1']
@@ -0,0 +1,99 @@
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.exception import convert_exception_to_response
+from django.db import connection
+from django.http import HttpResponse, JsonResponse
+from django.test import RequestFactory
+
+from foodgram.degradation import (circuit_breaker, degraded_mode_middleware,
+                                  get_timeout_routes, guard_execute,
+                                  install_guard)
+
+TOKEN = 'Token reader'
+
+
+@pytest.fixture(autouse=True)
+def closed_breaker():
+    yield
+    circuit_breaker.record_success()
+
+
+@pytest.fixture
+def timeouts(settings, transactional_db):
+    '''Лимит запросов к API в 10 мс и обертка, сообщающая
+    предохранителю об ошибках базы.
+    '''
+    settings.DB_STATEMENT_TIMEOUTS = ((r'^/api/', 10), )
+    get_timeout_routes.cache_clear()
+    install_guard(None, connection)
+    yield
+    get_timeout_routes.cache_clear()
+    connection.execute_wrappers.remove(guard_execute)
+    connection.close()
+
+
+def view(request):
+    if 'slow' in request.GET:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_sleep(0.1)')
+    return JsonResponse({'path': request.path})
+
+
+def make_worker():
+    return degraded_mode_middleware(convert_exception_to_response(view))
+
+
+def request(method, path='/api/recipes/', **extra):
+    return getattr(RequestFactory(), method)(path, **extra)
+
+
+def trip():
+    for _ in range(circuit_breaker.threshold):
+        circuit_breaker.record_failure()
+
+
+def test_database_errors_trip_breaker(timeouts):
+    worker = make_worker()
+    for _ in range(circuit_breaker.threshold):
+        assert not circuit_breaker.is_open
+        response = worker(request('get', '/api/recipes/?slow=1'))
+        assert response.status_code == 503
+    assert circuit_breaker.is_open
+
+
+def test_open_breaker_serves_stale_copy():
+    worker = make_worker()
+    fresh = worker(request('get'))
+    trip()
+    response = make_worker()(request('get', HTTP_AUTHORIZATION=TOKEN))
+    assert response.status_code == 200
+    assert response.content == fresh.content
+    assert response['Warning'] == '110 - "Response is Stale"'
+    assert int(response['Age']) >= 0
+
+
+def test_only_anonymous_responses_are_stored():
+    worker = make_worker()
+    worker(request('get', HTTP_AUTHORIZATION=TOKEN))
+    trip()
+    assert worker(request('get')).status_code == 503
+
+
+def test_private_routes_are_not_stored():
+    worker = make_worker()
+    worker(request('get', '/api/users/me/'))
+    trip()
+    assert worker(request('get', '/api/users/me/')).status_code == 503
+
+
+def test_open_breaker_rejects_writes():
+    trip()
+    response = make_worker()(request('post'))
+    assert response.status_code == 503
+    assert 'Retry-After' in response
+
+
+def test_process_local_cache_is_rejected(settings):
+    settings.SHARED_CACHE_REQUIRED = True
+    with pytest.raises(ImproperlyConfigured):
+        degraded_mode_middleware(HttpResponse)
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+from django.db import connections
+
+from foodgram.events import PostgresBroker
+
+MESSAGE = {'event': 'recipe_created', 'data': {'id': 1}}
+
+
+@pytest.fixture
+def subscriber():
+    broker = PostgresBroker()
+    yield broker
+    broker.close()
+
+
+def test_events_reach_other_processes(transactional_db, subscriber):
+    '''Публикующий брокер моделирует обработчик WSGI, принявший
+    запись, подписчик - процесс ASGI с открытым потоком событий.
+    '''
+    publisher = PostgresBroker()
+
+    def publish():
+        publisher.publish('author:2', MESSAGE)
+        publisher.publish('author:1', MESSAGE)
+        connections.close_all()
+
+    async def receive():
+        listener = subscriber.listener()
+        listener.listen('author:1')
+        await asyncio.to_thread(subscriber.listening.wait, 5)
+        await asyncio.to_thread(publish)
+        return await asyncio.wait_for(listener.get(), 5)
+
+    assert asyncio.run(receive()) == ('author:1', MESSAGE)
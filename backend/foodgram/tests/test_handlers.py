@@ -0,0 +1,33 @@
+import pytest
+from django.test import RequestFactory
+
+from foodgram.handlers import APIHandler, PipelineWSGIHandler
+
+
+def test_api_chain_is_built_from_api_middleware(settings):
+    middleware = list(settings.MIDDLEWARE)
+    handler = APIHandler()
+    handler.load_middleware()
+    assert settings.MIDDLEWARE == middleware
+    # process_view из всей цепочки есть только у CsrfViewMiddleware.
+    assert not handler._view_middleware
+    assert handler._middleware_chain is not None
+
+
+def test_api_chain_follows_api_middleware_setting(settings):
+    middleware = list(settings.MIDDLEWARE)
+    settings.API_MIDDLEWARE = ['django.middleware.csrf.CsrfViewMiddleware']
+    handler = APIHandler()
+    handler.load_middleware(is_async=True)
+    assert len(handler._view_middleware) == 1
+    assert settings.MIDDLEWARE == middleware
+
+
+@pytest.mark.django_db
+def test_api_requests_skip_sessions_and_csrf():
+    handler = PipelineWSGIHandler()
+    response = handler.get_response(RequestFactory().get('/api/tags/'))
+    assert response.status_code == 200
+    assert 'X-Frame-Options' not in response
+    response = handler.get_response(RequestFactory().get('/admin/login/'))
+    assert response['X-Frame-Options'] == 'DENY'
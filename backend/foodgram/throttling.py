@@ -0,0 +1,213 @@
+import threading
+import time
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+from django.utils.decorators import sync_and_async_middleware
+from django.utils.module_loading import import_string
+
+from recipes.cache import LRUCache
+from .caches import get_shared_cache
+
+CONCURRENCY_KEY = 'throttle-concurrency:{}'
+
+
+def refill(tokens, updated, now, capacity, rate):
+    return min(capacity, tokens + (now - updated) * rate)
+
+
+def spend(tokens, cost, rate):
+    """Списание cost жетонов. Возвращает остаток и время ожидания
+    в секундах (0, если жетонов хватило).
+    """
+    if tokens >= cost:
+        return tokens - cost, 0
+    return tokens, (cost - tokens) / rate
+
+
+class InProcessStore:
+    """Хранилище корзин жетонов и счетчиков одновременных запросов
+    в памяти процесса. Каждый процесс gunicorn считает только свои
+    запросы, поэтому хранилище подходит лишь для разработки; в
+    остальных случаях THROTTLE_BACKEND по умолчанию - CacheStore.
+    Другое хранилище должно реализовать методы take, acquire
+    и release.
+    """
+
+    def __init__(self):
+        self.buckets = LRUCache(settings.THROTTLE_STORE_SIZE)
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def take(self, key, cost, capacity, rate):
+        """Попытка взять cost жетонов из корзины емкостью capacity,
+        пополняемой на rate жетонов в секунду. Возвращает время
+        ожидания до появления нужного числа жетонов, 0 - успех.
+        """
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated = self.buckets.get(key) or (capacity, now)
+            tokens, wait = spend(
+                refill(tokens, updated, now, capacity, rate), cost, rate
+            )
+            self.buckets.set(key, (tokens, now))
+        return wait
+
+    def acquire(self, key, limit):
+        with self.lock:
+            if self.counters.get(key, 0) >= limit:
+                return False
+            self.counters[key] = self.counters.get(key, 0) + 1
+            return True
+
+    def release(self, key):
+        with self.lock:
+            self.counters[key] -= 1
+
+
+class CacheStore:
+    """Хранилище в общем кэше Django (THROTTLE_CACHE), разделяемое
+    процессами. Чтение и запись корзины не атомарны, поэтому при
+    гонках возможен небольшой перерасход жетонов. Счетчики
+    одновременных запросов живут THROTTLE_CONCURRENCY_TTL секунд
+    после последнего изменения, что исправляет их после аварийно
+    завершенных процессов.
+    """
+
+    def __init__(self):
+        self.cache = get_shared_cache(
+            settings.THROTTLE_CACHE, 'THROTTLE_CACHE'
+        )
+
+    def take(self, key, cost, capacity, rate):
+        now = time.time()
+        tokens, updated = self.cache.get(key) or (capacity, now)
+        tokens, wait = spend(
+            refill(tokens, updated, now, capacity, rate), cost, rate
+        )
+        self.cache.set(key, (tokens, now), int(capacity / rate) + 1)
+        return wait
+
+    def acquire(self, key, limit):
+        ttl = settings.THROTTLE_CONCURRENCY_TTL
+        self.cache.add(key, 0, ttl)
+        try:
+            count = self.cache.incr(key)
+        except ValueError:
+            # Счетчик истек между add и incr.
+            self.cache.add(key, 0, ttl)
+            count = self.cache.incr(key)
+        self.cache.touch(key, ttl)
+        if count > limit:
+            self.release(key)
+            return False
+        return True
+
+    def release(self, key):
+        """Освобождение места. Если счетчик истек во время запроса
+        и создан заново, он не уходит ниже нуля.
+        """
+        try:
+            if self.cache.decr(key) < 0:
+                self.cache.incr(key)
+        except ValueError:
+            return
+        self.cache.touch(key, settings.THROTTLE_CONCURRENCY_TTL)
+
+
+@lru_cache(maxsize=None)
+def get_throttle_store():
+    return import_string(settings.THROTTLE_BACKEND)()
+
+
+def get_concurrency_keys(request):
+    """Счетчики, которые занимает запрос: общий для API и отдельный,
+    более тесный, для анонимных запросов.
+    """
+    keys = [(CONCURRENCY_KEY.format('all'), settings.THROTTLE_CONCURRENCY)]
+    if 'HTTP_AUTHORIZATION' not in request.META:
+        keys.append((
+            CONCURRENCY_KEY.format('anon'),
+            settings.THROTTLE_ANON_CONCURRENCY,
+        ))
+    return [(key, limit) for key, limit in keys if limit is not None]
+
+
+def is_limited(request):
+    """Запросы к API, кроме долгих потоков событий из
+    THROTTLE_CONCURRENCY_EXEMPT_PATHS, которые занимали бы место
+    все время подписки.
+    """
+    return request.path.startswith('/api/') and not request.path.startswith(
+        settings.THROTTLE_CONCURRENCY_EXEMPT_PATHS
+    )
+
+
+def acquire_slots(store, keys):
+    acquired = []
+    for key, limit in keys:
+        if not store.acquire(key, limit):
+            release_slots(store, acquired)
+            return None
+        acquired.append(key)
+    return acquired
+
+
+def release_slots(store, acquired):
+    for key in acquired:
+        store.release(key)
+
+
+def overloaded_response():
+    response = JsonResponse(
+        {'detail': 'Сервер перегружен, повторите запрос позже.'},
+        status=503,
+    )
+    response['Retry-After'] = settings.THROTTLE_CONCURRENCY_RETRY_AFTER
+    return response
+
+
+@sync_and_async_middleware
+def concurrency_limit_middleware(get_response):
+    """Ограничение числа одновременно обрабатываемых запросов к API:
+    не больше THROTTLE_CONCURRENCY всего и THROTTLE_ANON_CONCURRENCY
+    анонимных, чтобы всплеск запросов не занял все обработчики.
+    Лишние запросы сразу получают 503 с Retry-After. Без заданных
+    лимитов middleware не подключается.
+    """
+
+    if (
+        settings.THROTTLE_CONCURRENCY is None
+        and settings.THROTTLE_ANON_CONCURRENCY is None
+    ):
+        raise MiddlewareNotUsed
+    store = get_throttle_store()
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not is_limited(request):
+                return await get_response(request)
+            keys = get_concurrency_keys(request)
+            acquired = await sync_to_async(acquire_slots)(store, keys)
+            if acquired is None:
+                return overloaded_response()
+            try:
+                return await get_response(request)
+            finally:
+                await sync_to_async(release_slots)(store, acquired)
+    else:
+        def middleware(request):
+            if not is_limited(request):
+                return get_response(request)
+            acquired = acquire_slots(store, get_concurrency_keys(request))
+            if acquired is None:
+                return overloaded_response()
+            try:
+                return get_response(request)
+            finally:
+                release_slots(store, acquired)
+
+    return middleware
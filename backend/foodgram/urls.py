@@ -1,7 +1,12 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from api.views import short_link_redirect
+
+admin.autodiscover()
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', include('api.urls'))
+    path('api/', include('api.urls')),
+    path('s/<str:code>/', short_link_redirect, name='short-link'),
 ]
@@ -0,0 +1,60 @@
+import multiprocessing
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.queue import Worker
+
+
+def run_worker(queues, once):
+    Worker(queues).run(once=once)
+
+
+class Command(BaseCommand):
+    '''Запуск обработчиков фоновых задач.'''
+
+    help = 'Running background job workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queue', action='append', dest='queues',
+            help='Queue to process (repeatable), all queues by default',
+        )
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Number of worker processes',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit when the queues are empty',
+        )
+
+    def handle(self, *args, **options):
+        queues = options['queues'] or list(settings.JOB_QUEUES)
+        self.stdout.write(
+            f'[!] Processing queues {", ".join(queues)} '
+            f'in {options["processes"]} process(es).'
+        )
+        if options['processes'] == 1:
+            run_worker(queues, options['once'])
+            return
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(
+                target=run_worker, args=(queues, options['once'])
+            )
+            for _ in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+
+        def stop(*args):
+            for worker in workers:
+                worker.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        for worker in workers:
+            worker.join()
@@ -0,0 +1,74 @@
+from django.db import models
+from django.utils import timezone
+
+QUEUE_MAX_LENGTH = 64
+TASK_MAX_LENGTH = 128
+KEY_MAX_LENGTH = 255
+WORKER_MAX_LENGTH = 128
+
+
+class Job(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Ожидает'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнено'),
+        (FAILED, 'Ошибка'),
+    )
+
+    queue = models.CharField('Очередь', max_length=QUEUE_MAX_LENGTH)
+    task = models.CharField('Задача', max_length=TASK_MAX_LENGTH)
+    payload = models.JSONField('Аргументы', default=dict)
+    key = models.CharField(
+        'Ключ идемпотентности',
+        max_length=KEY_MAX_LENGTH,
+        unique=True,
+        null=True,
+        blank=True,
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=max(len(status) for status, _ in STATUSES),
+        choices=STATUSES,
+        default=PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField('Попытки', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Максимум попыток')
+    run_at = models.DateTimeField('Запуск не ранее', default=timezone.now)
+    slot = models.PositiveSmallIntegerField(
+        'Слот очереди', null=True, blank=True
+    )
+    worker = models.CharField(
+        'Обработчик', max_length=WORKER_MAX_LENGTH, blank=True
+    )
+    started_at = models.DateTimeField('Начало', null=True, blank=True)
+    heartbeat_at = models.DateTimeField(
+        'Последний сигнал обработчика', null=True, blank=True
+    )
+    finished_at = models.DateTimeField('Завершение', null=True, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = (
+            models.Index(
+                fields=('queue', 'run_at'),
+                condition=models.Q(status='pending'),
+                name='job_pending_idx',
+            ),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=('queue', 'slot'),
+                condition=models.Q(status='running'),
+                name='unique_running_job_slot',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.task} [{self.queue}] {self.status}'
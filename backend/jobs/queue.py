@@ -0,0 +1,232 @@
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import (IntegrityError, close_old_connections, connections,
+                       transaction)
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+tasks = {}
+
+
+class Task:
+    '''Функция, зарегистрированная как фоновая задача.'''
+
+    def __init__(self, func, queue, max_attempts):
+        self.func = func
+        self.name = f'{func.__module__}.{func.__name__}'
+        self.queue = queue
+        self.max_attempts = max_attempts
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+    def enqueue(self, key=None, delay=0, **kwargs):
+        '''Постановка задачи в очередь в текущей транзакции.
+        Аргументы сохраняются как JSON. Задача с уже известным
+        ключом key повторно не ставится.
+        '''
+        if settings.JOBS_EAGER:
+            transaction.on_commit(lambda: self.func(**kwargs))
+            return None
+        values = {
+            'queue': self.queue,
+            'task': self.name,
+            'payload': kwargs,
+            'max_attempts': self.max_attempts,
+            'run_at': timezone.now() + timedelta(seconds=delay),
+        }
+        if key is None:
+            return Job.objects.create(**values)
+        job, _ = Job.objects.get_or_create(key=key, defaults=values)
+        return job
+
+
+def task(queue='default', max_attempts=None):
+    '''Декоратор регистрации фоновой задачи в очереди queue.'''
+    def decorator(func):
+        registered = Task(
+            func, queue, max_attempts or settings.JOB_MAX_ATTEMPTS
+        )
+        tasks[registered.name] = registered
+        return registered
+    return decorator
+
+
+def get_retry_delay(attempts):
+    '''Экспоненциальная задержка повтора со случайным разбросом.'''
+    delay = min(
+        settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+        settings.JOB_RETRY_MAX_SECONDS,
+    )
+    return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+def claim_job(queue, worker):
+    '''Захват очередной задачи из очереди.
+    Число одновременно выполняемых задач очереди ограничено
+    JOB_QUEUES[queue] слотами; занятость слота гарантирует
+    частичный уникальный индекс, а SKIP LOCKED не дает двум
+    обработчикам взять одну задачу.
+    '''
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            busy = set(Job.objects.filter(
+                queue=queue, status=Job.RUNNING
+            ).values_list('slot', flat=True))
+            free = [
+                slot for slot in range(settings.JOB_QUEUES.get(queue, 1))
+                if slot not in busy
+            ]
+            if not free:
+                return None
+            job = Job.objects.select_for_update(skip_locked=True).filter(
+                queue=queue, status=Job.PENDING, run_at__lte=now
+            ).order_by('run_at', 'id').first()
+            if job is None:
+                return None
+            job.status = Job.RUNNING
+            job.slot = free[0]
+            job.worker = worker
+            job.started_at = now
+            job.heartbeat_at = now
+            job.attempts += 1
+            job.save(update_fields=(
+                'status', 'slot', 'worker', 'started_at', 'heartbeat_at',
+                'attempts',
+            ))
+    except IntegrityError:
+        return None
+    return job
+
+
+class Heartbeat(threading.Thread):
+    '''Поток, который раз в JOB_HEARTBEAT_SECONDS обновляет
+    heartbeat_at выполняемой задачи, пока она не завершится.
+    '''
+
+    def __init__(self, job):
+        super().__init__(name=f'job-heartbeat-{job.id}', daemon=True)
+        self.job = job
+        self.finished = threading.Event()
+
+    def run(self):
+        try:
+            while not self.finished.wait(settings.JOB_HEARTBEAT_SECONDS):
+                try:
+                    Job.objects.filter(
+                        pk=self.job.pk, status=Job.RUNNING
+                    ).update(heartbeat_at=timezone.now())
+                except Exception:
+                    logger.exception(
+                        'Heartbeat of job %s failed', self.job.id
+                    )
+        finally:
+            connections.close_all()
+
+    def stop(self):
+        self.finished.set()
+        self.join()
+
+
+def run_job(job):
+    '''Выполнение захваченной задачи и запись результата.
+    Пока задача выполняется, Heartbeat отмечает, что обработчик
+    жив. После ошибки задача откладывается на get_retry_delay(),
+    пока не исчерпаны попытки.
+    '''
+    heartbeat = Heartbeat(job)
+    heartbeat.start()
+    try:
+        registered = tasks.get(job.task)
+        if registered is None:
+            raise LookupError(f'Задача {job.task} не зарегистрирована.')
+        registered.func(**job.payload)
+    except Exception:
+        logger.exception('Job %s (%s) failed', job.id, job.task)
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.PENDING
+            job.run_at = timezone.now() + get_retry_delay(job.attempts)
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+    else:
+        job.status = Job.DONE
+        job.finished_at = timezone.now()
+        job.last_error = ''
+    finally:
+        heartbeat.stop()
+    job.slot = None
+    job.save(update_fields=(
+        'status', 'slot', 'run_at', 'finished_at', 'last_error'
+    ))
+
+
+def release_stale_jobs():
+    '''Возврат в очередь задач, обработчик которых не присылал
+    сигнал дольше JOB_TIMEOUT_SECONDS (например, был остановлен).
+    Долгие задачи живого обработчика не трогаются.
+    '''
+    deadline = timezone.now() - timedelta(
+        seconds=settings.JOB_TIMEOUT_SECONDS
+    )
+    stale = Job.objects.filter(
+        Q(heartbeat_at__lt=deadline)
+        | Q(heartbeat_at__isnull=True, started_at__lt=deadline),
+        status=Job.RUNNING,
+    )
+    stale.filter(attempts__lt=F('max_attempts')).update(
+        status=Job.PENDING, slot=None, last_error='Превышено время выполнения.'
+    )
+    stale.update(
+        status=Job.FAILED, slot=None, finished_at=timezone.now(),
+        last_error='Превышено время выполнения.',
+    )
+
+
+class Worker:
+    '''Обработчик задач из заданных очередей.'''
+
+    def __init__(self, queues, name=None):
+        self.queues = queues
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = False
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def run_pending(self):
+        processed = 0
+        for queue in self.queues:
+            job = claim_job(queue, self.name)
+            if job is not None:
+                run_job(job)
+                processed += 1
+        return processed
+
+    def run(self, once=False):
+        '''Цикл обработки; при once=True выход, когда очереди пусты.'''
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        while not self.stopping:
+            close_old_connections()
+            release_stale_jobs()
+            while not self.stopping and self.run_pending():
+                close_old_connections()
+            if once:
+                break
+            time.sleep(settings.JOB_POLL_SECONDS)
@@ -0,0 +1,51 @@
+import time
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import claim_job, release_stale_jobs, run_job, task
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@task()
+def slow_job(seconds):
+    time.sleep(seconds)
+
+
+def running_job(started, heartbeat):
+    now = timezone.now()
+    return Job.objects.create(
+        queue='default', task=slow_job.name, max_attempts=5,
+        status=Job.RUNNING, slot=0, attempts=1,
+        started_at=now - timedelta(seconds=started),
+        heartbeat_at=now - timedelta(seconds=heartbeat),
+    )
+
+
+def test_long_job_with_heartbeat_is_kept(settings):
+    job = running_job(started=3600, heartbeat=1)
+    release_stale_jobs()
+    job.refresh_from_db()
+    assert job.status == Job.RUNNING
+
+
+def test_job_without_heartbeat_is_released(settings):
+    job = running_job(started=3600, heartbeat=settings.JOB_TIMEOUT_SECONDS + 1)
+    release_stale_jobs()
+    job.refresh_from_db()
+    assert job.status == Job.PENDING
+    assert job.slot is None
+
+
+def test_worker_refreshes_heartbeat(settings):
+    settings.JOB_HEARTBEAT_SECONDS = 0.05
+    slow_job.enqueue(seconds=0.3)
+    job = claim_job('default', 'test')
+    claimed_at = job.heartbeat_at
+    run_job(job)
+    job.refresh_from_db()
+    assert job.status == Job.DONE
+    assert job.heartbeat_at > claimed_at
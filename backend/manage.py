@@ -7,6 +7,7 @@ import sys
 def main():
     """Run administrative tasks."""
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    os.environ.setdefault('OPTIONAL_APPS', 'django_extensions')
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
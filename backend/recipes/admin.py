@@ -1,12 +1,42 @@
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
 
-from .models import (Ingredient, Favorites, Recipe, RecipeIngredient,
-                     ShoppingCart, Tag)
+from .deletion import delete_recipe
+from .models import (Deletion, Ingredient, Favorites, Recipe,
+                     RecipeIngredient, ShoppingCart, Tag)
+from .similarity import find_similar
+
+
+class DeferredDeletionAdmin(admin.ModelAdmin):
+    '''Удаление через пометку объекта; зависимые строки удаляются
+    в фоне и на странице подтверждения не перечисляются.
+    '''
+
+    delete_function = None
+
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(self.opts.verbose_name)
+        return (
+            [str(obj) for obj in objs],
+            {self.opts.verbose_name_plural: len(objs)},
+            perms_needed,
+            [],
+        )
+
+    def delete_model(self, request, obj):
+        self.delete_function(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            self.delete_function(obj)
 
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'measurement_unit')
+    list_display = ('id', 'name', 'measurement_unit', 'price', 'calories')
     search_fields = ('name', )
     list_filter = ('name', )
 
@@ -19,14 +49,30 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(DeferredDeletionAdmin):
     list_display = ('name', 'author', 'amount_favorites')
     search_fields = ('name', 'author')
     list_filter = ('name', 'author', 'tags')
+    actions = ('find_duplicates', )
+    delete_function = staticmethod(delete_recipe)
 
     def amount_favorites(self, obj):
         return obj.favorites.count()
 
+    @admin.action(description='Найти возможные дубликаты')
+    def find_duplicates(self, request, queryset):
+        found = False
+        for recipe in queryset:
+            duplicates = find_similar(recipe, settings.DUPLICATE_THRESHOLD)
+            if duplicates:
+                found = True
+                self.message_user(request, '{}: {}'.format(recipe, ', '.join(
+                    f'id {recipe_id} ({score:.0%})'
+                    for recipe_id, score in duplicates
+                )), messages.WARNING)
+        if not found:
+            self.message_user(request, 'Дубликаты не найдены.')
+
 
 @admin.register(Favorites)
 class FavoritesAdmin(admin.ModelAdmin):
@@ -43,3 +89,15 @@ class ShoppingCartAdmin(admin.ModelAdmin):
 @admin.register(RecipeIngredient)
 class RecipeIngredientAdmin(admin.ModelAdmin):
     list_display = ('id', 'recipe', 'ingredient', 'amount')
+
+
+@admin.register(Deletion)
+class DeletionAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'object_id', 'purged', 'created_at',
+                    'finished_at')
+    list_filter = ('kind', )
+    readonly_fields = ('kind', 'object_id', 'purged', 'created_at',
+                       'finished_at')
+
+    def has_add_permission(self, request):
+        return False
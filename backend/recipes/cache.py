@@ -0,0 +1,67 @@
+import threading
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+
+class LRUCache:
+    '''Потокобезопасный LRU-кэш ограниченного размера.'''
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.data:
+                return None
+            self.data.move_to_end(key)
+            return self.data[key]
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            if len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def get_many(self, keys):
+        with self.lock:
+            found = {}
+            for key in keys:
+                if key in self.data:
+                    self.data.move_to_end(key)
+                    found[key] = self.data[key]
+            return found
+
+
+class TieredCache:
+    '''Двухуровневый кэш: LRU в памяти процесса поверх
+    необязательного общего кэша Django (alias из CACHES).
+    '''
+
+    def __init__(self, maxsize, alias=None, timeout=None):
+        self.local = LRUCache(maxsize)
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def shared(self):
+        return caches[self.alias] if self.alias else None
+
+    def get_many(self, keys):
+        found = self.local.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing and self.shared is not None:
+            shared = self.shared.get_many(missing)
+            for key, value in shared.items():
+                self.local.set(key, value)
+            found.update(shared)
+        return found
+
+    def set_many(self, data):
+        for key, value in data.items():
+            self.local.set(key, value)
+        if data and self.shared is not None:
+            self.shared.set_many(data, self.timeout)
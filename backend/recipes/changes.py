@@ -0,0 +1,132 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import ChangeLogEntry
+
+
+def record_change(kind, object_id, user_id=None, deleted=False):
+    '''Запись изменения объекта в журнал.'''
+    ChangeLogEntry.objects.create(
+        kind=kind, object_id=object_id, user_id=user_id, deleted=deleted
+    )
+
+
+def record_recipe_changes(recipe_ids, deleted=False):
+    '''Запись изменений нескольких рецептов одним запросом.'''
+    ChangeLogEntry.objects.bulk_create(
+        (
+            ChangeLogEntry(
+                kind=ChangeLogEntry.RECIPE, object_id=recipe_id,
+                deleted=deleted,
+            )
+            for recipe_id in recipe_ids
+        ),
+        batch_size=settings.CHANGE_LOG_BATCH_SIZE,
+    )
+
+
+def format_token(position):
+    return '{}.{}'.format(*position)
+
+
+def parse_token(token):
+    '''Позиция (txid, id) из курсора вида "<txid>.<id>".'''
+    txid, dot, entry_id = token.partition('.')
+    if not (dot and txid.isdigit() and entry_id.isdigit()):
+        raise ValueError(f'Некорректный курсор {token!r}.')
+    return int(txid), int(entry_id)
+
+
+def get_horizon(using):
+    '''Наименьший номер транзакции, еще выполняющейся в базе using.
+    Все транзакции с меньшими номерами завершены, поэтому записи
+    с такими txid уже не появятся в журнале задним числом.
+    '''
+    with connections[using].cursor() as cursor:
+        cursor.execute('SELECT txid_snapshot_xmin(txid_current_snapshot())')
+        return cursor.fetchone()[0]
+
+
+def get_visible_changes(user, using, horizon):
+    '''Записи, доступные пользователю: общие изменения рецептов
+    и его собственные избранное, список покупок и подписки.
+    Отдаются только записи завершенных транзакций с txid меньше
+    horizon.
+    '''
+    visible = Q(user__isnull=True)
+    if user.is_authenticated:
+        visible |= Q(user=user)
+    return ChangeLogEntry.objects.using(using).filter(
+        visible, txid__lt=horizon
+    )
+
+
+def get_changes(user, since, limit):
+    '''Изменения после позиции since.
+    Записи упорядочены по (txid, id): номер транзакции выдается
+    до фиксации, но любая транзакция, которая зафиксируется позже,
+    получит номер не меньше текущего horizon, поэтому курсор никогда
+    не обгоняет незафиксированные записи.
+    Возвращает словарь {тип: {id объекта: удален ли}}, новую позицию
+    и признак того, что изменений больше limit. Если since старше
+    сжатой части журнала, возвращает None вместо изменений: клиенту
+    нужна полная синхронизация.
+    '''
+    using = router.db_for_read(ChangeLogEntry)
+    horizon = get_horizon(using)
+    if since is None or ChangeLogEntry.objects.using(using).filter(
+        kind=ChangeLogEntry.RESET, object_id__gte=since[0]
+    ).exists():
+        return None, (horizon, 0), False
+    txid, entry_id = since
+    entries = list(
+        get_visible_changes(user, using, horizon).filter(
+            Q(txid__gt=txid) | Q(txid=txid, id__gt=entry_id)
+        ).exclude(
+            kind=ChangeLogEntry.RESET
+        ).order_by('txid', 'id').values_list(
+            'txid', 'id', 'kind', 'object_id', 'deleted'
+        )[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    changes = {kind: {} for kind, _ in ChangeLogEntry.KINDS
+               if kind != ChangeLogEntry.RESET}
+    for _, _, kind, object_id, deleted in entries:
+        changes[kind][object_id] = deleted
+    if has_more:
+        return changes, entries[-1][:2], has_more
+    return changes, max(since, (horizon, 0)), has_more
+
+
+def compact_changes():
+    '''Сжатие журнала изменений.
+    Для каждого объекта остается только последняя в порядке выдачи
+    запись; записи старше CHANGE_LOG_RETENTION_DAYS удаляются,
+    и вместо них добавляется метка сброса с наибольшим txid удаленных
+    записей: клиенты с курсором не новее этой транзакции получают
+    указание выполнить полную синхронизацию.
+    '''
+    with transaction.atomic():
+        superseded, _ = ChangeLogEntry.objects.exclude(
+            id__in=ChangeLogEntry.objects.order_by(
+                'kind', 'object_id', 'user_id', '-txid', '-id'
+            ).distinct('kind', 'object_id', 'user_id').values('id')
+        ).delete()
+        expired = ChangeLogEntry.objects.filter(
+            created_at__lt=timezone.now() - timedelta(
+                days=settings.CHANGE_LOG_RETENTION_DAYS
+            )
+        ).exclude(kind=ChangeLogEntry.RESET)
+        horizon = expired.aggregate(horizon=Max('txid'))['horizon']
+        expired, _ = expired.delete()
+        if horizon is not None:
+            ChangeLogEntry.objects.filter(
+                kind=ChangeLogEntry.RESET
+            ).delete()
+            record_change(ChangeLogEntry.RESET, horizon)
+    return superseded + expired
@@ -0,0 +1,198 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from jobs.queue import task
+from users.models import Subscription
+from .changes import record_change, record_recipe_changes
+from .models import (ChangeLogEntry, Deletion, Favorites, Recipe,
+                     RecipeBucket, RecipeIngredient, ShoppingCart,
+                     TimelineEntry, Upload, User)
+
+logger = logging.getLogger(__name__)
+
+RECIPE_DEPENDENTS = (
+    RecipeIngredient,
+    Recipe.tags.through,
+    Favorites,
+    ShoppingCart,
+    TimelineEntry,
+    RecipeBucket,
+)
+USER_DEPENDENTS = (
+    (Favorites, 'user'),
+    (ShoppingCart, 'user'),
+    (TimelineEntry, 'user'),
+    (TimelineEntry, 'author'),
+    (Subscription, 'user'),
+    (Subscription, 'author'),
+    (ChangeLogEntry, 'user'),
+    (Upload, 'user'),
+)
+
+
+def start_purge(kind, object_id):
+    deletion, _ = Deletion.objects.get_or_create(
+        kind=kind, object_id=object_id
+    )
+    purge_deleted.enqueue(
+        deletion_id=deletion.id, key=f'purge:{deletion.id}'
+    )
+    return deletion
+
+
+def delete_recipe(recipe):
+    '''Пометка рецепта удаленным.
+    Рецепт сразу пропадает из выдачи; строки, которые на него
+    ссылаются, и изображение удаляет фоновая задача.
+    '''
+    now = timezone.now()
+    with transaction.atomic():
+        Recipe.objects.filter(pk=recipe.pk).update(
+            deleted_at=now, updated_at=now
+        )
+        record_change(ChangeLogEntry.RECIPE, recipe.pk, deleted=True)
+        return start_purge(Deletion.RECIPE, recipe.pk)
+
+
+def delete_user(user):
+    '''Пометка аккаунта и его рецептов удаленными.
+    Аккаунт деактивируется, токены удаляются, а имя и почта
+    освобождаются для новых регистраций; остальные данные
+    удаляет фоновая задача.
+    '''
+    now = timezone.now()
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(
+            deleted_at=now,
+            is_active=False,
+            username=f'deleted-{user.pk}',
+            email=f'deleted-{user.pk}@deleted.invalid',
+        )
+        Token.objects.filter(user_id=user.pk).delete()
+        recipes = Recipe.objects.filter(author_id=user.pk)
+        record_recipe_changes(
+            list(recipes.values_list('id', flat=True)), deleted=True
+        )
+        recipes.update(deleted_at=now, updated_at=now)
+        return start_purge(Deletion.USER, user.pk)
+
+
+def get_purge_steps(deletion):
+    '''Модели и условия отбора строк в порядке удаления: сначала
+    строки, ссылающиеся на рецепты, затем рецепты, строки,
+    ссылающиеся на пользователя, и сам пользователь.
+    '''
+    if deletion.kind == Deletion.RECIPE:
+        recipe_lookup = {'id': deletion.object_id}
+    else:
+        recipe_lookup = {'author_id': deletion.object_id}
+    steps = [
+        (model, {
+            f'recipe__{field}': value
+            for field, value in recipe_lookup.items()
+        })
+        for model in RECIPE_DEPENDENTS
+    ]
+    steps.append((Recipe, recipe_lookup))
+    if deletion.kind == Deletion.USER:
+        steps.extend(
+            (model, {field: deletion.object_id})
+            for model, field in USER_DEPENDENTS
+        )
+        steps.append((User, {'id': deletion.object_id}))
+    return steps
+
+
+def remove_files(files):
+    for storage, name in files:
+        storage.delete(name)
+
+
+def purge_batch(model, lookup):
+    '''Удаление не более DELETION_BATCH_SIZE строк в отдельной
+    транзакции. Файлы удаленных строк стираются после фиксации.
+    Возвращает число удаленных строк вместе с каскадными.
+    '''
+    manager = model._base_manager
+    ids = list(manager.filter(**lookup).order_by().values_list(
+        'pk', flat=True
+    )[:settings.DELETION_BATCH_SIZE])
+    if not ids:
+        return 0
+    rows = manager.filter(pk__in=ids)
+    file_fields = [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+    ]
+    with transaction.atomic():
+        files = [
+            (field.storage, name)
+            for field in file_fields
+            for name in rows.values_list(field.attname, flat=True)
+            if name
+        ]
+        deleted, _ = rows.delete()
+        transaction.on_commit(lambda: remove_files(files))
+    return deleted
+
+
+def purge(deletion, max_batches):
+    '''Удаление данных помеченного объекта не более чем max_batches
+    порциями. Прогресс копится в deletion.purged. Возвращает True,
+    когда удалять больше нечего.
+    '''
+    batches = 0
+    for model, lookup in get_purge_steps(deletion):
+        while batches < max_batches:
+            deleted = purge_batch(model, lookup)
+            if not deleted:
+                break
+            batches += 1
+            Deletion.objects.filter(pk=deletion.pk).update(
+                purged=F('purged') + deleted
+            )
+            logger.info(
+                'Deletion %s: %s rows purged from %s',
+                deletion.pk, deleted, model._meta.label,
+            )
+        else:
+            return False
+    Deletion.objects.filter(pk=deletion.pk).update(
+        finished_at=timezone.now()
+    )
+    return True
+
+
+@task(queue='cleanup')
+def purge_deleted(deletion_id):
+    '''Очистка данных удаленного объекта. Задача обрабатывает
+    DELETION_BATCHES_PER_JOB порций и при необходимости ставит
+    в очередь свое продолжение.
+    '''
+    deletion = Deletion.objects.filter(
+        id=deletion_id, finished_at__isnull=True
+    ).first()
+    if deletion is not None and not purge(
+        deletion, settings.DELETION_BATCHES_PER_JOB
+    ):
+        purge_deleted.enqueue(deletion_id=deletion_id)
+
+
+def purge_shopping_cart():
+    '''Удаление из списков покупок рецептов, добавленных раньше
+    SHOPPING_CART_MAX_AGE_DAYS дней назад. Возвращает число
+    удаленных строк.
+    '''
+    lookup = {'added_at__lt': timezone.now() - timedelta(
+        days=settings.SHOPPING_CART_MAX_AGE_DAYS
+    )}
+    purged = 0
+    while deleted := purge_batch(ShoppingCart, lookup):
+        purged += deleted
+    return purged
@@ -0,0 +1,161 @@
+import io
+import json
+import posixpath
+import zipfile
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from users.models import Subscription
+from .models import Favorites, Recipe, ShoppingCart
+
+IMAGES_DIR = 'images'
+
+
+class StreamBuffer(io.RawIOBase):
+    '''Несохраняющий поток для zipfile: записанные байты забираются
+    методом pop, поэтому в памяти держится только последняя порция.
+    '''
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def dump_json(value):
+    return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def image_path(name):
+    return posixpath.join(IMAGES_DIR, name) if name else None
+
+
+def write_json_array(archive, buffer, name, items):
+    '''Запись JSON-массива в архив по одному элементу.'''
+    with archive.open(name, 'w', force_zip64=True) as entry:
+        entry.write(b'[')
+        for index, item in enumerate(items):
+            if index:
+                entry.write(b',\n')
+            entry.write(dump_json(item).encode())
+            yield buffer.pop()
+        entry.write(b']\n')
+    yield buffer.pop()
+
+
+def write_file(archive, buffer, storage, name):
+    '''Копирование файла из хранилища в архив без сжатия.'''
+    if not name or not storage.exists(name):
+        return
+    with storage.open(name) as source:
+        with archive.open(
+            zipfile.ZipInfo(image_path(name)), 'w', force_zip64=True,
+        ) as entry:
+            for chunk in source.chunks():
+                entry.write(chunk)
+                yield buffer.pop()
+
+
+def get_recipes(user):
+    recipes = Recipe.objects.filter(author=user).prefetch_related(
+        'tags', 'recipe_ingredients__ingredient'
+    ).order_by('id')
+    for recipe in recipes.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        yield {
+            'id': recipe.id,
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'pub_date': recipe.pub_date,
+            'image': image_path(recipe.image.name),
+            'tags': [tag.slug for tag in recipe.tags.all()],
+            'ingredients': [
+                {
+                    'name': item.ingredient.name,
+                    'measurement_unit': item.ingredient.measurement_unit,
+                    'amount': item.amount,
+                }
+                for item in recipe.recipe_ingredients.all()
+            ],
+        }
+
+
+def get_recipe_images(user):
+    return Recipe.objects.filter(author=user).exclude(image='').order_by(
+        'id'
+    ).values_list('image', flat=True).iterator(
+        chunk_size=settings.EXPORT_CHUNK_SIZE
+    )
+
+
+def get_user_list(model, user):
+    return (
+        {'id': recipe_id, 'name': name, 'added_at': added_at}
+        for recipe_id, name, added_at in model.objects.filter(
+            user=user, recipe__deleted_at__isnull=True
+        ).order_by('added_at').values_list(
+            'recipe_id', 'recipe__name', 'added_at'
+        ).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    )
+
+
+def get_subscriptions(user):
+    return (
+        {'id': author_id, 'username': username}
+        for author_id, username in Subscription.objects.filter(
+            user=user, author__deleted_at__isnull=True
+        ).order_by('id').values_list(
+            'author_id', 'author__username'
+        ).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    )
+
+
+def export_user_data(user):
+    '''ZIP-архив с данными пользователя, отдаваемый по частям:
+    профиль, рецепты с изображениями, избранное, список покупок
+    и подписки. Данные читаются порциями по EXPORT_CHUNK_SIZE,
+    а архив отдается по мере записи, так что объем памяти
+    не зависит от размера аккаунта.
+    '''
+    buffer = StreamBuffer()
+    storage = Recipe._meta.get_field('image').storage
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        yield from write_json_array(archive, buffer, 'profile.json', [{
+            'id': user.id,
+            'email': user.email,
+            'username': user.username,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'avatar': image_path(user.avatar.name),
+        }])
+        yield from write_file(
+            archive, buffer, user.avatar.storage, user.avatar.name
+        )
+        yield from write_json_array(
+            archive, buffer, 'recipes.json', get_recipes(user)
+        )
+        for name in get_recipe_images(user):
+            yield from write_file(archive, buffer, storage, name)
+        yield from write_json_array(
+            archive, buffer, 'favorites.json',
+            get_user_list(Favorites, user),
+        )
+        yield from write_json_array(
+            archive, buffer, 'shopping_cart.json',
+            get_user_list(ShoppingCart, user),
+        )
+        yield from write_json_array(
+            archive, buffer, 'subscriptions.json', get_subscriptions(user)
+        )
+    yield buffer.pop()
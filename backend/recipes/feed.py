@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.db.models import Q
+
+from users.models import Subscription
+from .models import Recipe, TimelineEntry
+
+
+def fan_out_recipe(recipe):
+    '''Рассылка нового рецепта в ленты подписчиков автора.
+    Рецепты авторов с числом подписчиков больше FEED_FANOUT_LIMIT
+    не рассылаются и попадают в ленту при чтении.
+    '''
+    subscribers = Subscription.objects.filter(author_id=recipe.author_id)
+    if subscribers.count() > settings.FEED_FANOUT_LIMIT:
+        return
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                author_id=recipe.author_id,
+                recipe=recipe,
+                pub_date=recipe.pub_date,
+            )
+            for user_id in subscribers.values_list('user_id', flat=True)
+        ),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    Recipe.objects.filter(pk=recipe.pk).update(in_timelines=True)
+    recipe.in_timelines = True
+
+
+def add_author_to_timeline(subscription):
+    '''Заполнение ленты последними рецептами автора при подписке.'''
+    recipes = Recipe.objects.filter(
+        author_id=subscription.author_id, in_timelines=True
+    ).values_list('id', 'pub_date')[:settings.FEED_BACKFILL_SIZE]
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=subscription.user_id,
+                author_id=subscription.author_id,
+                recipe_id=recipe_id,
+                pub_date=pub_date,
+            )
+            for recipe_id, pub_date in recipes
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def remove_author_from_timeline(subscription):
+    '''Удаление рецептов автора из ленты при отписке.'''
+    TimelineEntry.objects.filter(
+        user_id=subscription.user_id, author_id=subscription.author_id
+    ).delete()
+
+
+def get_feed(user):
+    '''Рецепты авторов, на которых подписан пользователь.'''
+    return Recipe.objects.filter(
+        Q(id__in=TimelineEntry.objects.filter(user=user).values('recipe'))
+        | Q(
+            in_timelines=False,
+            author__in=Subscription.objects.filter(
+                user=user
+            ).values('author'),
+        )
+    )
@@ -0,0 +1,119 @@
+import threading
+import time
+from datetime import timedelta
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Recipe, RecipeIngredient
+
+SYNC_OVERLAP = timedelta(minutes=1)
+
+
+class IngredientIndex:
+    '''Инвертированный индекс ингредиент -> рецепты в памяти процесса.
+    Списки рецептов хранятся в массивах numpy, число ингредиентов
+    рецепта - в массиве, индексированном по id рецепта. Индекс
+    строится при первом запросе и затем обновляется только для
+    рецептов, измененных с момента последней синхронизации;
+    раз в rebuild_interval секунд индекс перестраивается целиком,
+    чтобы исключить удаленные рецепты.
+    '''
+
+    def __init__(self, ttl, rebuild_interval):
+        self.ttl = ttl
+        self.rebuild_interval = rebuild_interval
+        self.postings = {}
+        self.sizes = np.zeros(0, dtype=np.int16)
+        self.synced_at = None
+        self.checked_at = 0
+        self.built_at = 0
+        self.lock = threading.Lock()
+
+    def ensure_fresh(self):
+        if time.monotonic() - self.checked_at < self.ttl:
+            return
+        now = timezone.now()
+        if (
+            self.synced_at is None
+            or time.monotonic() - self.built_at > self.rebuild_interval
+        ):
+            self.build()
+        else:
+            changed = Recipe._base_manager.filter(
+                updated_at__gte=self.synced_at - SYNC_OVERLAP
+            ).values_list('id', flat=True)
+            self.update(np.fromiter(changed, dtype=np.int64))
+        self.synced_at = now
+        self.checked_at = time.monotonic()
+
+    def build(self):
+        self.postings = {}
+        self.sizes = np.zeros(0, dtype=np.int16)
+        self.add_rows(RecipeIngredient.objects.filter(
+            recipe__deleted_at__isnull=True
+        ))
+        self.built_at = time.monotonic()
+
+    def update(self, recipe_ids):
+        if not len(recipe_ids):
+            return
+        for ingredient_id, posting in self.postings.items():
+            self.postings[ingredient_id] = posting[
+                ~np.isin(posting, recipe_ids)
+            ]
+        known = recipe_ids[recipe_ids < len(self.sizes)]
+        self.sizes[known] = 0
+        self.add_rows(RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids.tolist(),
+            recipe__deleted_at__isnull=True,
+        ))
+
+    def add_rows(self, queryset):
+        rows = queryset.values_list('ingredient_id', 'recipe_id').order_by(
+            'ingredient_id'
+        ).iterator(chunk_size=settings.INGREDIENT_INDEX_CHUNK_SIZE)
+        rows = np.fromiter(
+            chain.from_iterable(rows), dtype=np.int64
+        ).reshape(-1, 2)
+        if not len(rows):
+            return
+        ingredient_ids, recipe_ids = rows[:, 0], rows[:, 1]
+        if recipe_ids.max() >= len(self.sizes):
+            sizes = np.zeros(recipe_ids.max() + 1, dtype=np.int16)
+            sizes[:len(self.sizes)] = self.sizes
+            self.sizes = sizes
+        np.add.at(self.sizes, recipe_ids, 1)
+        starts = np.flatnonzero(np.diff(ingredient_ids, prepend=-1))
+        for start, posting in zip(starts, np.split(recipe_ids, starts[1:])):
+            ingredient_id = int(ingredient_ids[start])
+            if ingredient_id in self.postings:
+                posting = np.union1d(self.postings[ingredient_id], posting)
+            self.postings[ingredient_id] = posting
+
+    def search(self, have, exclude=(), min_coverage=0):
+        '''Рецепты, отсортированные по доле имеющихся ингредиентов.
+        Возвращает списки id рецептов и их покрытия.
+        '''
+        with self.lock:
+            self.ensure_fresh()
+            counts = np.zeros(len(self.sizes), dtype=np.int16)
+            for ingredient_id in set(have):
+                if ingredient_id in self.postings:
+                    counts[self.postings[ingredient_id]] += 1
+            for ingredient_id in set(exclude):
+                if ingredient_id in self.postings:
+                    counts[self.postings[ingredient_id]] = 0
+            candidates = np.flatnonzero(counts)
+            coverage = counts[candidates] / self.sizes[candidates]
+        selected = coverage >= min_coverage
+        candidates, coverage = candidates[selected], coverage[selected]
+        order = np.lexsort((-counts[candidates], -coverage))
+        return candidates[order].tolist(), coverage[order].tolist()
+
+
+ingredient_index = IngredientIndex(
+    settings.INGREDIENT_INDEX_TTL, settings.INGREDIENT_INDEX_REBUILD_SECONDS
+)
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.similarity import index_recipe
+
+
+class Command(BaseCommand):
+    '''Построение индекса похожих рецептов.'''
+
+    help = 'Building recipe similarity index'
+
+    def handle(self, *args, **options):
+        count = 0
+        recipes = Recipe.objects.prefetch_related('recipe_ingredients')
+        for recipe in recipes.iterator(chunk_size=500):
+            index_recipe(recipe, [
+                item.ingredient_id
+                for item in recipe.recipe_ingredients.all()
+            ])
+            count += 1
+        self.stdout.write(f'[!] {count} recipes have been indexed.')
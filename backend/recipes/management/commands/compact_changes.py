@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from recipes.changes import compact_changes
+
+
+class Command(BaseCommand):
+    '''Сжатие журнала изменений.'''
+
+    help = 'Compacting the change log'
+
+    def handle(self, *args, **options):
+        deleted = compact_changes()
+        self.stdout.write(
+            f'[!] {deleted} change log entries have been removed.'
+        )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from foodgram.dataset import dump_dataset
+
+
+class Command(BaseCommand):
+    '''Выгрузка данных пользователей и рецептов.'''
+
+    help = 'Dumping users and recipes tables into a directory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Target directory')
+        parser.add_argument(
+            '--database', default='default',
+            help='Database to dump from',
+        )
+        parser.add_argument(
+            '--jobs', type=int, default=4,
+            help='Number of tables dumped in parallel',
+        )
+        parser.add_argument(
+            '--media', action='store_true',
+            help='Copy referenced media files into the dump',
+        )
+
+    def handle(self, *args, **options):
+        manifest = dump_dataset(
+            options['directory'], using=options['database'],
+            jobs=options['jobs'], media=options['media'],
+        )
+        rows = sum(table['rows'] for table in manifest['tables'].values())
+        self.stdout.write(
+            f'[!] {rows} rows from {len(manifest["tables"])} tables '
+            'have been dumped.'
+        )
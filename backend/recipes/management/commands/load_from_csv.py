@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 import pandas as pd
 
 from recipes.models import Ingredient
+from recipes.nutrition import INGREDIENT_FIELDS
 
 
 class Command(BaseCommand):
@@ -10,10 +11,13 @@ class Command(BaseCommand):
     help = 'Adding ingredients'
 
     def handle(self, *args, **options):
-        for index, row in pd.read_csv('data/ingredients.csv').iterrows():
+        data = pd.read_csv('data/ingredients.csv')
+        values = [field for field in INGREDIENT_FIELDS if field in data]
+        for index, row in data.iterrows():
             ingredient = Ingredient(
                 name=row['name'],
-                measurement_unit=row['measurement_unit']
+                measurement_unit=row['measurement_unit'],
+                **{field: row[field] for field in values}
             )
             ingredient.save()
         self.stdout.write("[!] The ingredients has been loaded successfully.")
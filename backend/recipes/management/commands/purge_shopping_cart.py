@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from recipes.deletion import purge_shopping_cart
+
+
+class Command(BaseCommand):
+    '''Удаление устаревших записей списков покупок.'''
+
+    help = 'Purging old shopping cart entries'
+
+    def handle(self, *args, **options):
+        deleted = purge_shopping_cart()
+        self.stdout.write(
+            f'[!] {deleted} shopping cart entries have been purged.'
+        )
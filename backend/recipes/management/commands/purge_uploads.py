@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from recipes.uploads import purge_uploads
+
+
+class Command(BaseCommand):
+    '''Удаление устаревших загрузок изображений.'''
+
+    help = 'Purging expired image uploads'
+
+    def handle(self, *args, **options):
+        deleted = purge_uploads()
+        self.stdout.write(f'[!] {deleted} uploads have been purged.')
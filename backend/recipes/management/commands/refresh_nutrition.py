@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from recipes.nutrition import refresh_nutrition
+
+
+class Command(BaseCommand):
+    '''Пересчет стоимости и пищевой ценности рецептов.'''
+
+    help = 'Refreshing recipe cost and nutrition rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Recompute all recipes, not only changed ones',
+        )
+
+    def handle(self, *args, **options):
+        refreshed = refresh_nutrition(full=options['full'])
+        self.stdout.write(f'[!] {refreshed} recipes have been refreshed.')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from recipes.popularity import refresh_popularity
+
+
+class Command(BaseCommand):
+    '''Пересчет рейтинга популярных рецептов.'''
+
+    help = 'Refreshing popular recipes ranking'
+
+    def handle(self, *args, **options):
+        ranked = refresh_popularity()
+        self.stdout.write(f'[!] {ranked} recipes have been ranked.')
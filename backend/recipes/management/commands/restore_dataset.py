@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from foodgram.dataset import restore_dataset
+
+
+class Command(BaseCommand):
+    '''Загрузка выгрузки dump_dataset.'''
+
+    help = 'Restoring users and recipes tables from a dump_dataset directory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Dump directory')
+        parser.add_argument(
+            '--database', default='default',
+            help='Database to restore into',
+        )
+        parser.add_argument(
+            '--jobs', type=int, default=4,
+            help='Number of tables restored in parallel',
+        )
+        parser.add_argument(
+            '--truncate', action='store_true',
+            help='Empty the tables first (on PostgreSQL tables referencing '
+                 'them, such as auth tokens, are emptied too)',
+        )
+        parser.add_argument(
+            '--media', action='store_true',
+            help='Copy media files from the dump into the storage',
+        )
+
+    def handle(self, *args, **options):
+        rows = restore_dataset(
+            options['directory'], using=options['database'],
+            jobs=options['jobs'], truncate=options['truncate'],
+            media=options['media'],
+        )
+        self.stdout.write(f'[!] {rows} rows have been restored.')
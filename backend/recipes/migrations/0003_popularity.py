@@ -0,0 +1,50 @@
+# Generated by Django 5.1.2 on 2026-10-19 07:48
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def before_popular_window():
+    '''Дата добавления для уже существующих строк: настоящая
+    неизвестна, поэтому они считаются добавленными до начала окна
+    POPULAR_WINDOW_DAYS и не попадают в первый расчет рейтинга.
+    '''
+    return timezone.now() - timedelta(days=settings.POPULAR_WINDOW_DAYS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_timeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipePopularity',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('score', models.FloatField(db_index=True, verbose_name='Рейтинг популярности')),
+            ],
+            options={
+                'verbose_name': 'Популярность рецепта',
+                'verbose_name_plural': 'Популярность рецептов',
+                'ordering': ('-score',),
+            },
+        ),
+        migrations.AddField(
+            model_name='favorites',
+            name='added_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=before_popular_window, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='added_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=before_popular_window, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+    ]
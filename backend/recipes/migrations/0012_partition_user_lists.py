@@ -0,0 +1,130 @@
+from django.db import migrations
+
+PARTITIONS = 8
+MODELS = ('Favorites', 'ShoppingCart')
+
+
+def rebuild_table(schema_editor, model, partitions):
+    '''Пересоздание таблицы со списком пользователя с переносом строк.
+    При partitions таблица секционируется по хэшу user_id, первичный
+    ключ в базе становится (id, user_id), а id выдается
+    последовательностью, принадлежащей столбцу; без partitions
+    создается обычная таблица.
+    '''
+    quote = schema_editor.quote_name
+    meta = model._meta
+    table = meta.db_table
+    old_table = f'{table}_old'
+    sequence = f'{table}_id_seq'
+    fields = [field for field in meta.concrete_fields if not field.primary_key]
+    columns = ', '.join(
+        quote(column) for column in ['id'] + [f.column for f in fields]
+    )
+    if partitions:
+        id_column = (
+            f"{quote('id')} bigint NOT NULL DEFAULT nextval('{sequence}')"
+        )
+        primary_key = f'PRIMARY KEY ({quote("id")}, {quote("user_id")})'
+        partition_by = f' PARTITION BY HASH ({quote("user_id")})'
+    else:
+        id_column = (
+            f'{quote("id")} bigint NOT NULL GENERATED BY DEFAULT AS IDENTITY'
+        )
+        primary_key = f'PRIMARY KEY ({quote("id")})'
+        partition_by = ''
+    statements = [
+        f'ALTER TABLE {quote(table)} RENAME TO {quote(old_table)}',
+        f'ALTER TABLE {quote(old_table)} ALTER COLUMN {quote("id")} '
+        'DROP IDENTITY IF EXISTS',
+        f'ALTER TABLE {quote(old_table)} ALTER COLUMN {quote("id")} '
+        'DROP DEFAULT',
+        f'DROP SEQUENCE IF EXISTS {quote(sequence)}',
+    ]
+    if partitions:
+        statements.append(f'CREATE SEQUENCE {quote(sequence)}')
+    statements.append('CREATE TABLE {} ({}){}'.format(
+        quote(table),
+        ', '.join([id_column] + [
+            f'{quote(field.column)} '
+            f'{field.db_type(schema_editor.connection)} NOT NULL'
+            for field in fields
+        ]),
+        partition_by,
+    ))
+    for remainder in range(partitions or 0):
+        statements.append(
+            f'CREATE TABLE {quote(f"{table}_p{remainder}")} '
+            f'PARTITION OF {quote(table)} '
+            f'FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})'
+        )
+    statements += [
+        f'INSERT INTO {quote(table)} ({columns}) '
+        f'SELECT {columns} FROM {quote(old_table)}',
+        f'DROP TABLE {quote(old_table)}',
+        f'ALTER TABLE {quote(table)} ADD {primary_key}',
+    ]
+    if partitions:
+        statements += [
+            f'ALTER SEQUENCE {quote(sequence)} '
+            f'OWNED BY {quote(table)}.{quote("id")}',
+            f"SELECT setval('{sequence}', "
+            f'COALESCE((SELECT MAX({quote("id")}) FROM {quote(table)}), 0) '
+            '+ 1, false)',
+        ]
+    else:
+        statements.append(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f'COALESCE((SELECT MAX({quote("id")}) FROM {quote(table)}), 0) '
+            '+ 1, false)'
+        )
+    for constraint in meta.constraints:
+        unique_columns = ', '.join(
+            quote(meta.get_field(name).column) for name in constraint.fields
+        )
+        statements.append(
+            f'ALTER TABLE {quote(table)} ADD CONSTRAINT '
+            f'{quote(constraint.name)} UNIQUE ({unique_columns})'
+        )
+    for field in fields:
+        if field.is_relation:
+            statements.append(
+                f'ALTER TABLE {quote(table)} ADD CONSTRAINT '
+                f'{quote(f"{table}_{field.column}_fk")} '
+                f'FOREIGN KEY ({quote(field.column)}) REFERENCES '
+                f'{quote(field.related_model._meta.db_table)} '
+                f'({quote(field.target_field.column)}) '
+                'DEFERRABLE INITIALLY DEFERRED'
+            )
+        if field.db_index:
+            statements.append(
+                f'CREATE INDEX {quote(f"{table}_{field.column}_idx")} '
+                f'ON {quote(table)} ({quote(field.column)})'
+            )
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def partition(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in MODELS:
+        rebuild_table(schema_editor, apps.get_model('recipes', name),
+                      PARTITIONS)
+
+
+def unpartition(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in MODELS:
+        rebuild_table(schema_editor, apps.get_model('recipes', name), None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_deletion'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition, unpartition),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.2 on 2026-10-19 14:20
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_partition_user_lists'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='price',
+            field=models.FloatField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Цена единицы'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='calories',
+            field=models.FloatField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Калорийность единицы'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='proteins',
+            field=models.FloatField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Белки в единице'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='fats',
+            field=models.FloatField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Жиры в единице'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='carbohydrates',
+            field=models.FloatField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Углеводы в единице'),
+        ),
+        migrations.CreateModel(
+            name='RecipeNutrition',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='nutrition', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('version', models.PositiveIntegerField(verbose_name='Версия рецепта')),
+                ('cost', models.FloatField(db_index=True, verbose_name='Стоимость')),
+                ('calories', models.FloatField(db_index=True, verbose_name='Калорийность')),
+                ('proteins', models.FloatField(db_index=True, verbose_name='Белки')),
+                ('fats', models.FloatField(db_index=True, verbose_name='Жиры')),
+                ('carbohydrates', models.FloatField(db_index=True, verbose_name='Углеводы')),
+            ],
+            options={
+                'verbose_name': 'Пищевая ценность рецепта',
+                'verbose_name_plural': 'Пищевая ценность рецептов',
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+import recipes.models
+
+CREATE_MASK_BITS = '''
+CREATE FUNCTION recipes_mask_bits(mask bigint) RETURNS integer[]
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+    SELECT COALESCE(array_agg(bit), '{}')
+    FROM generate_series(0, 62) AS bit
+    WHERE mask & (1::bigint << bit) <> 0
+$$
+'''
+DROP_MASK_BITS = 'DROP FUNCTION recipes_mask_bits(bigint)'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_nutrition'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_MASK_BITS, DROP_MASK_BITS),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(recipes.models.MaskBits('tags_mask'), name='recipe_tags_mask_bits_idx'),
+        ),
+    ]
@@ -1,10 +1,33 @@
+import uuid
+
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 
 User = get_user_model()
 
 NAME_MAX_LENGTH = 250
+MAX_TAG_BITS = 63
+SHORT_CODE_MAX_LENGTH = 16
+IMAGE_FORMAT_MAX_LENGTH = 8
+
+
+class MaskBits(models.Func):
+    '''Номера установленных битов маски тэгов. SQL-функция
+    recipes_mask_bits создается миграцией 0014_tags_mask_index.
+    '''
+
+    function = 'recipes_mask_bits'
+    output_field = ArrayField(models.IntegerField())
+
+
+class RecipeManager(models.Manager):
+    '''Менеджер рецептов, скрывающий рецепты, помеченные удаленными.'''
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
 
 
 class Ingredient(models.Model):
@@ -16,6 +39,31 @@ class Ingredient(models.Model):
         'Единица измерения',
         max_length=NAME_MAX_LENGTH,
     )
+    price = models.FloatField(
+        'Цена единицы',
+        default=0,
+        validators=(MinValueValidator(0),),
+    )
+    calories = models.FloatField(
+        'Калорийность единицы',
+        default=0,
+        validators=(MinValueValidator(0),),
+    )
+    proteins = models.FloatField(
+        'Белки в единице',
+        default=0,
+        validators=(MinValueValidator(0),),
+    )
+    fats = models.FloatField(
+        'Жиры в единице',
+        default=0,
+        validators=(MinValueValidator(0),),
+    )
+    carbohydrates = models.FloatField(
+        'Углеводы в единице',
+        default=0,
+        validators=(MinValueValidator(0),),
+    )
 
     class Meta:
         ordering = ('name',)
@@ -38,6 +86,12 @@ class Tag(models.Model):
         max_length=NAME_MAX_LENGTH,
         unique=True
     )
+    bit = models.PositiveSmallIntegerField(
+        'Бит в маске тэгов',
+        unique=True,
+        null=True,
+        editable=False,
+    )
 
     class Meta:
         ordering = ('name',)
@@ -92,11 +146,47 @@ class Recipe(models.Model):
         auto_now_add=True,
         editable=False,
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+        db_index=True,
+    )
+    version = models.PositiveIntegerField(
+        'Версия',
+        default=1,
+        editable=False,
+    )
+    tags_mask = models.BigIntegerField(
+        'Маска тэгов',
+        default=0,
+        editable=False,
+    )
+    in_timelines = models.BooleanField(
+        'Разослан в ленты подписчиков',
+        default=False,
+        editable=False,
+    )
+    deleted_at = models.DateTimeField(
+        'Дата удаления',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
+    objects = RecipeManager()
 
     class Meta:
         ordering = ('-pub_date', )
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = (
+            models.Index(
+                fields=('author', '-pub_date'),
+                condition=models.Q(in_timelines=False),
+                name='recipe_fanout_on_read_idx',
+            ),
+            GinIndex(MaskBits('tags_mask'), name='recipe_tags_mask_bits_idx'),
+        )
 
     def __str__(self):
         return self.name
@@ -127,7 +217,7 @@ class RecipeIngredient(models.Model):
     )
 
     class Meta:
-        ordering = ('recipe', )
+        ordering = ('recipe', 'id')
         verbose_name = 'Ингредиент для рецепта'
         verbose_name_plural = 'Ингредиенты для рецепта'
         constraints = (
@@ -151,6 +241,11 @@ class Favorites(models.Model):
         verbose_name='Рецепт',
         on_delete=models.CASCADE,
     )
+    added_at = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+        db_index=True,
+    )
 
     class Meta:
         verbose_name = 'Избранное'
@@ -179,6 +274,11 @@ class ShoppingCart(models.Model):
         verbose_name='Рецепт',
         on_delete=models.CASCADE,
     )
+    added_at = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+        db_index=True,
+    )
 
     class Meta:
         verbose_name = 'Список покупок'
@@ -192,3 +292,280 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user.username} добавил {self.recipe.name} в список'
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        related_name='timeline',
+        verbose_name='Подписчик',
+        on_delete=models.CASCADE,
+    )
+    author = models.ForeignKey(
+        User,
+        related_name='+',
+        verbose_name='Автор рецепта',
+        on_delete=models.CASCADE,
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name='timeline_entries',
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date', )
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe', ),
+                name='unique_timeline_recipe_for_user'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date'),
+                name='timeline_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='timeline_user_author_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe.name} в ленте у {self.user.username}'
+
+
+class RecipePopularity(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        related_name='popularity',
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+    )
+    score = models.FloatField('Рейтинг популярности', db_index=True)
+
+    class Meta:
+        ordering = ('-score', )
+        verbose_name = 'Популярность рецепта'
+        verbose_name_plural = 'Популярность рецептов'
+
+    def __str__(self):
+        return f'{self.recipe.name}: {self.score:.2f}'
+
+
+class RecipeNutrition(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        related_name='nutrition',
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+    )
+    version = models.PositiveIntegerField('Версия рецепта')
+    cost = models.FloatField('Стоимость', db_index=True)
+    calories = models.FloatField('Калорийность', db_index=True)
+    proteins = models.FloatField('Белки', db_index=True)
+    fats = models.FloatField('Жиры', db_index=True)
+    carbohydrates = models.FloatField('Углеводы', db_index=True)
+
+    class Meta:
+        verbose_name = 'Пищевая ценность рецепта'
+        verbose_name_plural = 'Пищевая ценность рецептов'
+
+    def __str__(self):
+        return f'{self.recipe.name}: {self.calories:.0f} ккал'
+
+
+class ShortLink(models.Model):
+    code = models.CharField(
+        'Код короткой ссылки',
+        max_length=SHORT_CODE_MAX_LENGTH,
+        unique=True,
+    )
+    recipe = models.OneToOneField(
+        Recipe,
+        related_name='short_link',
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+    )
+    hits = models.PositiveBigIntegerField('Переходы', default=0)
+
+    class Meta:
+        verbose_name = 'Короткая ссылка'
+        verbose_name_plural = 'Короткие ссылки'
+
+    def __str__(self):
+        return f'{self.code} -> {self.recipe_id}'
+
+
+class RecipeSignature(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        related_name='signature',
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+    )
+    minhash = models.BinaryField('MinHash-сигнатура')
+
+    class Meta:
+        verbose_name = 'Сигнатура рецепта'
+        verbose_name_plural = 'Сигнатуры рецептов'
+
+
+class RecipeBucket(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name='lsh_buckets',
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+    )
+    band = models.PositiveSmallIntegerField('Полоса')
+    bucket = models.BigIntegerField('Корзина')
+
+    class Meta:
+        verbose_name = 'Корзина LSH'
+        verbose_name_plural = 'Корзины LSH'
+        indexes = (
+            models.Index(
+                fields=('band', 'bucket'),
+                name='recipe_lsh_bucket_idx',
+            ),
+        )
+
+
+class Upload(models.Model):
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False,
+    )
+    user = models.ForeignKey(
+        User,
+        related_name='uploads',
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+    )
+    size = models.PositiveIntegerField('Размер, байт')
+    offset = models.PositiveIntegerField('Получено, байт', default=0)
+    image_format = models.CharField(
+        'Формат изображения',
+        max_length=IMAGE_FORMAT_MAX_LENGTH,
+        blank=True,
+    )
+    completed = models.BooleanField('Завершена', default=False)
+    created_at = models.DateTimeField(
+        'Дата создания',
+        auto_now_add=True,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'Загрузка изображения'
+        verbose_name_plural = 'Загрузки изображений'
+
+    def __str__(self):
+        return f'{self.id}: {self.offset}/{self.size}'
+
+
+class ChangeLogEntry(models.Model):
+    RECIPE = 'recipe'
+    FAVORITE = 'favorite'
+    SHOPPING_CART = 'shopping_cart'
+    SUBSCRIPTION = 'subscription'
+    RESET = 'reset'
+    KINDS = (
+        (RECIPE, 'Рецепт'),
+        (FAVORITE, 'Избранное'),
+        (SHOPPING_CART, 'Список покупок'),
+        (SUBSCRIPTION, 'Подписка'),
+        (RESET, 'Сброс истории'),
+    )
+
+    user = models.ForeignKey(
+        User,
+        related_name='+',
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+    kind = models.CharField(
+        'Тип объекта',
+        max_length=max(len(kind) for kind, _ in KINDS),
+        choices=KINDS,
+    )
+    object_id = models.BigIntegerField('Id объекта')
+    deleted = models.BooleanField('Удален', default=False)
+    created_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now_add=True,
+        db_index=True,
+    )
+    txid = models.BigIntegerField(
+        'Транзакция',
+        db_default=models.Func(
+            function='txid_current', output_field=models.BigIntegerField()
+        ),
+        editable=False,
+    )
+
+    class Meta:
+        verbose_name = 'Изменение'
+        verbose_name_plural = 'Журнал изменений'
+        indexes = (
+            models.Index(
+                fields=('txid', 'id'),
+                name='change_log_position_idx',
+            ),
+            models.Index(
+                fields=('user', 'txid', 'id'),
+                name='change_log_user_position_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.id}: {self.kind} {self.object_id}'
+
+
+class Deletion(models.Model):
+    USER = 'user'
+    RECIPE = 'recipe'
+    KINDS = (
+        (USER, 'Пользователь'),
+        (RECIPE, 'Рецепт'),
+    )
+
+    kind = models.CharField(
+        'Тип объекта',
+        max_length=max(len(kind) for kind, _ in KINDS),
+        choices=KINDS,
+    )
+    object_id = models.BigIntegerField('Id объекта')
+    purged = models.PositiveBigIntegerField('Удалено строк', default=0)
+    created_at = models.DateTimeField('Дата удаления', auto_now_add=True)
+    finished_at = models.DateTimeField(
+        'Очистка завершена',
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        ordering = ('-created_at', )
+        verbose_name = 'Удаление'
+        verbose_name_plural = 'Удаления'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('kind', 'object_id'),
+                name='unique_deletion'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}: {self.purged}'
@@ -0,0 +1,32 @@
+from foodgram.events import get_broker
+
+RECIPE_CREATED = 'recipe_created'
+RECIPE_UPDATED = 'recipe_updated'
+
+
+def author_channel(author_id):
+    return f'author:{author_id}'
+
+
+def subscriptions_channel(user_id):
+    return f'subscriptions:{user_id}'
+
+
+def publish_recipe(recipe, created):
+    '''Уведомление подписчиков автора о новом или измененном рецепте.'''
+    get_broker().publish(author_channel(recipe.author_id), {
+        'event': RECIPE_CREATED if created else RECIPE_UPDATED,
+        'data': {
+            'id': recipe.id,
+            'author': recipe.author_id,
+            'name': recipe.name,
+        },
+    })
+
+
+def publish_subscription(subscription, subscribed):
+    '''Уведомление открытых соединений пользователя о смене подписок.'''
+    get_broker().publish(subscriptions_channel(subscription.user_id), {
+        'author': subscription.author_id,
+        'subscribed': subscribed,
+    })
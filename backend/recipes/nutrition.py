@@ -0,0 +1,127 @@
+import time
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F, Q
+
+from jobs.queue import task
+from .models import Ingredient, Recipe, RecipeIngredient, RecipeNutrition
+
+ROLLUPS = (
+    ('price', 'cost'),
+    ('calories', 'calories'),
+    ('proteins', 'proteins'),
+    ('fats', 'fats'),
+    ('carbohydrates', 'carbohydrates'),
+)
+INGREDIENT_FIELDS = tuple(source for source, _ in ROLLUPS)
+NUTRITION_FIELDS = tuple(target for _, target in ROLLUPS)
+
+
+def load_array(queryset, width, dtype):
+    '''Строки values_list в виде двумерного массива numpy.'''
+    rows = queryset.order_by().iterator(
+        chunk_size=settings.NUTRITION_CHUNK_SIZE
+    )
+    return np.fromiter(
+        chain.from_iterable(rows), dtype=dtype
+    ).reshape(-1, width)
+
+
+def load_unit_values():
+    '''Значения ингредиентов на единицу измерения: строка массива -
+    id ингредиента, столбцы - INGREDIENT_FIELDS.
+    '''
+    rows = load_array(
+        Ingredient.objects.values_list('id', *INGREDIENT_FIELDS),
+        len(INGREDIENT_FIELDS) + 1, np.float64,
+    )
+    ids = rows[:, 0].astype(np.int64)
+    values = np.zeros(
+        (ids.max() + 1 if len(ids) else 0, len(INGREDIENT_FIELDS))
+    )
+    values[ids] = rows[:, 1:]
+    return values
+
+
+def compute_rollups(recipe_ids):
+    '''Суммы по рецептам из отсортированного массива recipe_ids:
+    количество каждого ингредиента, умноженное на его значения
+    на единицу, складывается по рецепту за один проход.
+    '''
+    rows = load_array(
+        RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids.tolist()
+        ).values_list('recipe_id', 'ingredient_id', 'amount'),
+        3, np.int64,
+    )
+    totals = np.zeros((len(recipe_ids), len(ROLLUPS)))
+    if len(rows):
+        unit_values = load_unit_values()
+        np.add.at(
+            totals,
+            np.searchsorted(recipe_ids, rows[:, 0]),
+            rows[:, 2, None] * unit_values[rows[:, 1]],
+        )
+    return totals
+
+
+def get_stale_recipes(full=False):
+    '''Id и версии рецептов без актуальных сумм: еще не посчитанных
+    или измененных после расчета; при full - всех рецептов.
+    '''
+    recipes = Recipe.objects.all()
+    if not full:
+        recipes = recipes.filter(
+            Q(nutrition__isnull=True) | ~Q(nutrition__version=F('version'))
+        )
+    return load_array(recipes.values_list('id', 'version'), 2, np.int64)
+
+
+def refresh_nutrition(full=False):
+    '''Пересчет стоимости и пищевой ценности рецептов.
+    Рецепты обрабатываются порциями по NUTRITION_CHUNK_SIZE: строки
+    ингредиентов порции загружаются массивами, суммы считаются
+    векторно и записываются одним upsert. Вместе с суммами
+    сохраняется версия рецепта, поэтому повторный запуск
+    пересчитывает только измененные рецепты. Возвращает число
+    пересчитанных рецептов.
+    '''
+    stale = get_stale_recipes(full)
+    stale = stale[np.argsort(stale[:, 0])]
+    for start in range(0, len(stale), settings.NUTRITION_CHUNK_SIZE):
+        chunk = stale[start:start + settings.NUTRITION_CHUNK_SIZE]
+        totals = compute_rollups(chunk[:, 0])
+        RecipeNutrition.objects.bulk_create(
+            (
+                RecipeNutrition(
+                    recipe_id=recipe_id, version=version,
+                    **dict(zip(NUTRITION_FIELDS, values)),
+                )
+                for (recipe_id, version), values in zip(
+                    chunk.tolist(), totals.tolist()
+                )
+            ),
+            update_conflicts=True,
+            unique_fields=('recipe', ),
+            update_fields=('version', ) + NUTRITION_FIELDS,
+            batch_size=1000,
+        )
+    return len(stale)
+
+
+@task()
+def update_nutrition():
+    '''Пересчет сумм рецептов, измененных с прошлого запуска.'''
+    refresh_nutrition()
+
+
+def schedule_nutrition_update():
+    '''Постановка пересчета в очередь. Изменения за
+    NUTRITION_UPDATE_DELAY секунд собираются в одну задачу.
+    '''
+    delay = settings.NUTRITION_UPDATE_DELAY
+    update_nutrition.enqueue(
+        key=f'nutrition:{int(time.time() // delay)}', delay=delay
+    )
@@ -0,0 +1,44 @@
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Favorites, RecipePopularity, ShoppingCart
+
+ACTIVITY_WEIGHTS = (
+    (Favorites, 1.0),
+    (ShoppingCart, 0.5),
+)
+
+
+def refresh_popularity(now=None):
+    '''Пересчет рейтинга популярности по недавней активности.
+    Каждое добавление в избранное или список покупок вносит вклад,
+    затухающий экспоненциально с периодом полураспада
+    POPULAR_HALF_LIFE_HOURS; учитываются только события
+    за последние POPULAR_WINDOW_DAYS дней.
+    '''
+    now = now or timezone.now()
+    since = now - timedelta(days=settings.POPULAR_WINDOW_DAYS)
+    decay = math.log(2) / (settings.POPULAR_HALF_LIFE_HOURS * 3600)
+    scores = defaultdict(float)
+    for model, weight in ACTIVITY_WEIGHTS:
+        events = model.objects.filter(added_at__gte=since).values_list(
+            'recipe_id', 'added_at'
+        )
+        for recipe_id, added_at in events.iterator(chunk_size=2000):
+            age = (now - added_at).total_seconds()
+            scores[recipe_id] += weight * math.exp(-decay * age)
+    with transaction.atomic():
+        RecipePopularity.objects.all().delete()
+        RecipePopularity.objects.bulk_create(
+            (
+                RecipePopularity(recipe_id=recipe_id, score=score)
+                for recipe_id, score in scores.items()
+            ),
+            batch_size=1000,
+        )
+    return len(scores)
@@ -0,0 +1,85 @@
+import atexit
+import string
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import F
+
+from .cache import LRUCache
+from .models import ShortLink
+
+ALPHABET = string.digits + string.ascii_letters
+
+
+def encode_base62(number):
+    '''Кодирование целого числа в base62.'''
+    code = ''
+    while True:
+        number, remainder = divmod(number, len(ALPHABET))
+        code = ALPHABET[remainder] + code
+        if not number:
+            return code
+
+
+def get_short_code(recipe):
+    '''Код короткой ссылки рецепта, создается один раз.'''
+    short_link, _ = ShortLink.objects.get_or_create(
+        recipe=recipe, defaults={'code': encode_base62(recipe.id)}
+    )
+    return short_link.code
+
+
+class HitCounter:
+    '''Счетчик переходов, сбрасываемый в базу пачками.'''
+
+    def __init__(self, flush_size, flush_interval):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.hits = Counter()
+        self.pending = 0
+        self.flushed_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add(self, code):
+        with self.lock:
+            self.hits[code] += 1
+            self.pending += 1
+            if (
+                self.pending < self.flush_size
+                and time.monotonic() - self.flushed_at < self.flush_interval
+            ):
+                return
+        self.flush()
+
+    def flush(self):
+        with self.lock:
+            hits, self.hits = self.hits, Counter()
+            self.pending = 0
+            self.flushed_at = time.monotonic()
+        for code, count in hits.items():
+            ShortLink.objects.filter(code=code).update(
+                hits=F('hits') + count
+            )
+
+
+resolved_links = LRUCache(settings.SHORT_LINK_CACHE_SIZE)
+hit_counter = HitCounter(
+    settings.SHORT_LINK_FLUSH_HITS, settings.SHORT_LINK_FLUSH_SECONDS
+)
+atexit.register(hit_counter.flush)
+
+
+def resolve_short_code(code):
+    '''Id рецепта по коду короткой ссылки или None.'''
+    recipe_id = resolved_links.get(code)
+    if recipe_id is None:
+        recipe_id = ShortLink.objects.filter(code=code).values_list(
+            'recipe_id', flat=True
+        ).first()
+        if recipe_id is None:
+            return None
+        resolved_links.set(code, recipe_id)
+    hit_counter.add(code)
+    return recipe_id
@@ -0,0 +1,180 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.expressions import Combinable
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from users.models import Subscription, User
+from .feed import add_author_to_timeline, remove_author_from_timeline
+from .changes import record_change, record_recipe_changes
+from .models import (ChangeLogEntry, Favorites, Ingredient, Recipe,
+                     RecipeIngredient, ShoppingCart, Tag, Upload)
+from .notifications import publish_recipe, publish_subscription
+from .nutrition import schedule_nutrition_update
+from .tag_bits import (assign_tag_bit, clear_tag_bit, refresh_tags_mask,
+                       tag_bits)
+from .uploads import remove_upload_file
+
+IGNORED_FIELDS = {'last_login', 'password', 'bit'}
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name', 'avatar')
+PUBLISHED_FIELDS = {'name', 'text', 'image', 'cooking_time'}
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        add_author_to_timeline(instance)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    remove_author_from_timeline(instance)
+
+
+@receiver(pre_save, sender=Tag)
+def tag_saving(sender, instance, **kwargs):
+    if instance.bit is None:
+        assign_tag_bit(instance)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, **kwargs):
+    transaction.on_commit(tag_bits.invalidate)
+
+
+def bump_recipe_versions(recipe_ids):
+    '''Новая версия рецептов: кэш фрагментов и суммы пересчитываются,
+    клиенты журнала изменений получают рецепты заново.
+    '''
+    recipe_ids = list(recipe_ids)
+    Recipe.objects.filter(id__in=recipe_ids).update(
+        version=F('version') + 1
+    )
+    record_recipe_changes(recipe_ids)
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_saving(sender, instance, raw, update_fields, **kwargs):
+    '''Любое полное сохранение существующего рецепта (API, админка,
+    shell) увеличивает его версию; служебные сохранения с
+    update_fields версию не меняют.
+    '''
+    if not raw and not instance._state.adding and update_fields is None:
+        instance.version = F('version') + 1
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, **kwargs):
+    if isinstance(instance.version, Combinable):
+        instance.refresh_from_db(fields=('version', ))
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_changed(sender, instance, action, reverse, pk_set,
+                               **kwargs):
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        bump_recipe_versions([instance.pk])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    bump_recipe_versions([instance.recipe_id])
+    schedule_nutrition_update()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=User)
+def recipe_dependency_changed(sender, instance, created, update_fields,
+                              **kwargs):
+    if created or update_fields and set(update_fields) <= IGNORED_FIELDS:
+        return
+    if sender is User and not instance.get_changed_fields(AUTHOR_FIELDS):
+        return
+    lookup = {
+        Tag: 'tags',
+        Ingredient: 'ingredients',
+        User: 'author',
+    }[sender]
+    bump_recipe_versions(Recipe.objects.filter(
+        **{lookup: instance}
+    ).values_list('id', flat=True))
+    if sender is Ingredient:
+        schedule_nutrition_update()
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleting(sender, instance, **kwargs):
+    clear_tag_bit(instance)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        refresh_tags_mask([instance.pk])
+        bump_recipe_versions([instance.pk])
+    elif reverse and action in ('post_add', 'post_remove'):
+        refresh_tags_mask(pk_set)
+        bump_recipe_versions(pk_set)
+    elif reverse and action == 'pre_clear':
+        clear_tag_bit(instance)
+        bump_recipe_versions(instance.recipes.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Upload)
+def upload_deleted(sender, instance, **kwargs):
+    remove_upload_file(instance)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, signal, **kwargs):
+    record_change(
+        ChangeLogEntry.RECIPE, instance.pk, deleted=signal is post_delete
+    )
+
+
+@receiver(post_save, sender=Favorites)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Favorites)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Subscription)
+def user_list_changed(sender, instance, signal, **kwargs):
+    kind, field = {
+        Favorites: (ChangeLogEntry.FAVORITE, 'recipe_id'),
+        ShoppingCart: (ChangeLogEntry.SHOPPING_CART, 'recipe_id'),
+        Subscription: (ChangeLogEntry.SUBSCRIPTION, 'author_id'),
+    }[sender]
+    record_change(
+        kind, getattr(instance, field), instance.user_id,
+        deleted=signal is post_delete,
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, raw, update_fields,
+                     **kwargs):
+    '''Событие для подписчиков при создании рецепта и при изменении
+    того, что видят пользователи; служебные сохранения с update_fields
+    без PUBLISHED_FIELDS событий не порождают.
+    '''
+    if raw or not (
+        created or update_fields is None
+        or PUBLISHED_FIELDS & set(update_fields)
+    ):
+        return
+    transaction.on_commit(lambda: publish_recipe(instance, created))
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def subscription_published(sender, instance, signal, **kwargs):
+    subscribed = signal is post_save
+    transaction.on_commit(
+        lambda: publish_subscription(instance, subscribed)
+    )
@@ -0,0 +1,93 @@
+import hashlib
+import re
+from functools import reduce
+from operator import or_
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Q
+
+from .models import RecipeBucket, RecipeSignature
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+WORD_RE = re.compile(r'\w{3,}')
+
+permutations = np.random.default_rng(settings.MINHASH_SEED).integers(
+    1, MAX_HASH, dtype=np.uint64,
+    size=(2, settings.MINHASH_BANDS * settings.MINHASH_ROWS),
+)
+
+
+def stable_hash(value, size=4):
+    return int.from_bytes(
+        hashlib.blake2b(value, digest_size=size).digest(),
+        'little', signed=size == 8,
+    )
+
+
+def get_features(name, ingredient_ids):
+    '''Признаки рецепта: ингредиенты и слова названия.'''
+    return (
+        {f'i:{ingredient_id}' for ingredient_id in ingredient_ids}
+        | {f'w:{word}' for word in WORD_RE.findall(name.lower())}
+    )
+
+
+def get_minhash(features):
+    '''MinHash-сигнатура множества признаков.'''
+    hashes = np.array(
+        [stable_hash(feature.encode()) for feature in features],
+        dtype=np.uint64,
+    )
+    a, b = permutations
+    values = (np.outer(hashes, a) + b) % MERSENNE_PRIME & MAX_HASH
+    return values.min(axis=0).astype(np.uint32)
+
+
+def get_buckets(minhash):
+    '''Хэши полос сигнатуры для LSH-таблицы.'''
+    bands = minhash.reshape(settings.MINHASH_BANDS, settings.MINHASH_ROWS)
+    return [
+        (band, stable_hash(rows.tobytes(), size=8))
+        for band, rows in enumerate(bands)
+    ]
+
+
+def index_recipe(recipe, ingredient_ids):
+    '''Обновление сигнатуры и корзин LSH рецепта.'''
+    features = get_features(recipe.name, ingredient_ids)
+    if not features:
+        return
+    minhash = get_minhash(features)
+    RecipeSignature.objects.update_or_create(
+        recipe=recipe, defaults={'minhash': minhash.tobytes()}
+    )
+    RecipeBucket.objects.filter(recipe=recipe).delete()
+    RecipeBucket.objects.bulk_create(
+        RecipeBucket(recipe=recipe, band=band, bucket=bucket)
+        for band, bucket in get_buckets(minhash)
+    )
+
+
+def find_similar(recipe, threshold=None):
+    '''Похожие рецепты с оценкой сходства Жаккара по сигнатурам.'''
+    threshold = threshold or settings.SIMILARITY_THRESHOLD
+    signature = RecipeSignature.objects.filter(recipe=recipe).first()
+    if signature is None:
+        return []
+    minhash = np.frombuffer(signature.minhash, dtype=np.uint32)
+    candidates = RecipeBucket.objects.filter(reduce(or_, (
+        Q(band=band, bucket=bucket)
+        for band, bucket in get_buckets(minhash)
+    ))).exclude(recipe=recipe).values('recipe')
+    similar = []
+    for recipe_id, other in RecipeSignature.objects.filter(
+        recipe__in=candidates
+    ).values_list('recipe_id', 'minhash'):
+        score = float(np.mean(
+            minhash == np.frombuffer(other, dtype=np.uint32)
+        ))
+        if score >= threshold:
+            similar.append((recipe_id, score))
+    return sorted(similar, key=lambda item: item[1], reverse=True)
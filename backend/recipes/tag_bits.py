@@ -0,0 +1,115 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import F
+
+from foodgram.caches import get_shared_cache
+from .models import MAX_TAG_BITS, Recipe, Tag
+
+TAG_BITS_VERSION_KEY = 'tag-bits-version'
+
+
+class TagBits:
+    '''Соответствие слагов тэгов битам маски, хранимое в памяти.
+    Изменение тэгов увеличивает номер версии в общем кэше
+    TAG_BITS_CACHE, и каждый процесс перечитывает соответствие,
+    как только видит новую версию.
+    '''
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.bits = None
+        self.version = None
+        self.loaded_at = 0
+        self.lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return get_shared_cache(settings.TAG_BITS_CACHE, 'TAG_BITS_CACHE')
+
+    def get(self):
+        version = self.cache.get(TAG_BITS_VERSION_KEY, 0)
+        with self.lock:
+            if (
+                self.bits is None
+                or self.version != version
+                or time.monotonic() - self.loaded_at > self.ttl
+            ):
+                self.bits = dict(Tag.objects.filter(
+                    bit__isnull=False
+                ).values_list('slug', 'bit'))
+                self.version = version
+                self.loaded_at = time.monotonic()
+            return self.bits
+
+    def invalidate(self):
+        self.cache.add(TAG_BITS_VERSION_KEY, 0, None)
+        self.cache.incr(TAG_BITS_VERSION_KEY)
+        with self.lock:
+            self.bits = None
+
+
+tag_bits = TagBits(settings.TAG_BITS_TTL)
+
+
+def get_tag_bits(slugs):
+    '''Номера битов для набора слагов тэгов.'''
+    bits = tag_bits.get()
+    return sorted({bits[slug] for slug in slugs})
+
+
+def assign_tag_bit(tag):
+    '''Назначение тэгу первого свободного бита маски.'''
+    used = set(Tag.objects.filter(bit__isnull=False).values_list(
+        'bit', flat=True
+    ))
+    free = [bit for bit in range(MAX_TAG_BITS) if bit not in used]
+    if not free:
+        raise ValueError(
+            f'Число тэгов не может превышать {MAX_TAG_BITS}.'
+        )
+    tag.bit = free[0]
+
+
+def refresh_tags_mask(recipe_ids):
+    '''Пересчет маски тэгов для рецептов по связям с тэгами
+    одним запросом UPDATE ... FROM с агрегацией bit_or.
+    '''
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    connection = connections[router.db_for_write(Recipe)]
+    quote_name = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            '''
+            UPDATE {recipe} AS recipe SET tags_mask = masks.mask
+            FROM (
+                SELECT listed.id,
+                       COALESCE(bit_or(1::bigint << tag.bit), 0) AS mask
+                FROM {recipe} AS listed
+                LEFT JOIN {link} AS link ON link.recipe_id = listed.id
+                LEFT JOIN {tag} AS tag
+                    ON tag.id = link.tag_id AND tag.bit IS NOT NULL
+                WHERE listed.id = ANY(%s)
+                GROUP BY listed.id
+            ) AS masks
+            WHERE recipe.id = masks.id
+            '''.format(
+                recipe=quote_name(Recipe._meta.db_table),
+                link=quote_name(Recipe.tags.through._meta.db_table),
+                tag=quote_name(Tag._meta.db_table),
+            ),
+            [recipe_ids],
+        )
+
+
+def clear_tag_bit(tag):
+    '''Снятие бита тэга со всех рецептов.'''
+    if tag.bit is None:
+        return
+    Recipe.objects.filter(tags=tag).update(
+        tags_mask=F('tags_mask').bitand(~(1 << tag.bit))
+    )
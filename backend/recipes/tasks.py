@@ -0,0 +1,15 @@
+from jobs.queue import task
+from .deletion import purge_deleted  # noqa: F401
+from .feed import fan_out_recipe
+from .models import Recipe
+from .nutrition import update_nutrition  # noqa: F401
+
+
+@task(queue='feed')
+def fan_out(recipe_id):
+    '''Рассылка нового рецепта в ленты подписчиков.
+    До выполнения задачи рецепт попадает в ленту при чтении.
+    '''
+    recipe = Recipe.objects.filter(id=recipe_id).first()
+    if recipe is not None and not recipe.in_timelines:
+        fan_out_recipe(recipe)
@@ -0,0 +1,59 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+
+from recipes.changes import compact_changes, get_changes, record_change
+from recipes.models import ChangeLogEntry
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture
+def pending():
+    '''Отдельное соединение с открытой транзакцией, записавшей
+    изменение рецепта 1, но еще не зафиксированной.
+    '''
+    other = connection.get_new_connection(connection.get_connection_params())
+    other.autocommit = False
+    with other.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {ChangeLogEntry._meta.db_table} '
+            '(kind, object_id, deleted, created_at) '
+            "VALUES ('recipe', 1, false, now())"
+        )
+    yield other
+    other.rollback()
+    other.close()
+
+
+def sync(since):
+    changes, token, _ = get_changes(AnonymousUser(), since, 100)
+    return changes and sorted(changes[ChangeLogEntry.RECIPE]), token
+
+
+def test_cursor_waits_for_open_transactions(pending):
+    _, token = sync(None)
+    record_change(ChangeLogEntry.RECIPE, 2)
+    recipes, token = sync(token)
+    assert recipes == []
+    pending.commit()
+    recipes, token = sync(token)
+    assert recipes == [1, 2]
+    assert sync(token)[0] == []
+
+
+def test_compacted_cursor_requires_reset():
+    _, token = sync(None)
+    record_change(ChangeLogEntry.RECIPE, 1)
+    record_change(ChangeLogEntry.RESET, token[0])
+    assert sync(token)[0] is None
+
+
+def test_compaction_keeps_last_entry_per_object():
+    record_change(ChangeLogEntry.RECIPE, 1)
+    record_change(ChangeLogEntry.RECIPE, 1, deleted=True)
+    record_change(ChangeLogEntry.RECIPE, 2)
+    assert compact_changes() == 1
+    assert sorted(ChangeLogEntry.objects.values_list(
+        'object_id', 'deleted'
+    )) == [(1, True), (2, False)]
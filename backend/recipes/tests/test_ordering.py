@@ -0,0 +1,41 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory
+
+from api.filters import RecipeFilter
+from recipes.models import Recipe, RecipeNutrition
+from users.models import User
+
+
+@pytest.fixture
+def recipes(db):
+    '''Рецепты стоимостью 30 и 10 и рецепт без посчитанных сумм.'''
+    author = User.objects.create(username='author', email='a@example.com')
+    created = {
+        name: Recipe.objects.create(
+            name=name, author=author, text='Сварить', image='recipes/a.jpg'
+        )
+        for name in ('Дорогой', 'Дешевый', 'Новый')
+    }
+    for name, cost in (('Дорогой', 30), ('Дешевый', 10)):
+        RecipeNutrition.objects.create(
+            recipe=created[name], version=1, cost=cost,
+            calories=0, proteins=0, fats=0, carbohydrates=0,
+        )
+    return created
+
+
+def ordered(ordering):
+    request = RequestFactory().get('/api/recipes/', {'ordering': ordering})
+    request.user = AnonymousUser()
+    return [recipe.name for recipe in RecipeFilter(
+        request.GET, queryset=Recipe.objects.all(), request=request
+    ).qs]
+
+
+@pytest.mark.parametrize('ordering, names', (
+    ('cost', ['Дешевый', 'Дорогой', 'Новый']),
+    ('-cost', ['Дорогой', 'Дешевый', 'Новый']),
+))
+def test_recipes_without_nutrition_go_last(recipes, ordering, names):
+    assert ordered(ordering) == names
@@ -0,0 +1,100 @@
+import pytest
+from django.urls import reverse
+
+from recipes.models import (ChangeLogEntry, Ingredient, Recipe,
+                            RecipeIngredient, Tag)
+from users.models import User
+
+
+@pytest.fixture
+def author(db):
+    user = User.objects.create(
+        username='author', email='author@example.com',
+        first_name='Иван', last_name='Иванов',
+    )
+    Recipe.objects.create(
+        name='Борщ', author=user, text='Сварить', image='recipes/borsch.jpg'
+    )
+    return User.objects.get(pk=user.pk)
+
+
+def get_version(author):
+    return Recipe.objects.get(author=author).version
+
+
+def test_profile_fields_bump_recipe_versions(author):
+    author.first_name = 'Петр'
+    author.save()
+    assert get_version(author) == 2
+    assert ChangeLogEntry.objects.filter(
+        kind=ChangeLogEntry.RECIPE, deleted=False
+    ).count() == 2
+
+
+def test_other_user_fields_leave_recipes_alone(author):
+    author.set_password('new-password')
+    author.is_staff = True
+    author.save()
+    assert get_version(author) == 1
+    assert ChangeLogEntry.objects.filter(
+        kind=ChangeLogEntry.RECIPE
+    ).count() == 1
+
+
+def test_avatar_change_bumps_recipe_versions(author):
+    author.avatar = 'user_images/avatar.png'
+    author.save()
+    assert get_version(author) == 2
+
+
+def test_admin_edit_bumps_recipe_version(author, admin_client):
+    recipe = Recipe.objects.get(author=author)
+    tag = Tag.objects.create(name='Обед', slug='lunch')
+    response = admin_client.post(
+        reverse('admin:recipes_recipe_change', args=(recipe.pk, )),
+        {
+            'name': 'Щи', 'author': author.pk, 'text': 'Сварить',
+            'cooking_time': 30, 'tags': [tag.pk],
+        },
+    )
+    assert response.status_code == 302
+    recipe.refresh_from_db()
+    assert recipe.name == 'Щи'
+    assert recipe.version > 1
+
+
+def test_ingredient_rows_bump_recipe_version(author):
+    recipe = Recipe.objects.get(author=author)
+    ingredient = Ingredient.objects.create(
+        name='Свекла', measurement_unit='г'
+    )
+    row = RecipeIngredient.objects.create(
+        recipe=recipe, ingredient=ingredient, amount=100
+    )
+    assert get_version(author) == 2
+    row.delete()
+    assert get_version(author) == 3
+
+
+def test_service_saves_keep_version(author):
+    recipe = Recipe.objects.get(author=author)
+    recipe.in_timelines = True
+    recipe.save(update_fields=('in_timelines', ))
+    assert get_version(author) == 1
+
+
+def test_only_visible_changes_are_published(
+    author, monkeypatch, django_capture_on_commit_callbacks
+):
+    published = []
+    monkeypatch.setattr(
+        'recipes.signals.publish_recipe',
+        lambda recipe, created: published.append(created),
+    )
+    recipe = Recipe.objects.get(author=author)
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.in_timelines = True
+        recipe.save(update_fields=('in_timelines', ))
+        recipe.name = 'Щи'
+        recipe.save(update_fields=('name', ))
+    assert published == [False]
@@ -0,0 +1,12 @@
+from recipes.models import Tag
+from recipes.tag_bits import TagBits
+
+
+def test_new_tag_is_seen_by_other_workers(
+    db, django_capture_on_commit_callbacks
+):
+    reader = TagBits(ttl=60)
+    assert reader.get() == {}
+    with django_capture_on_commit_callbacks(execute=True):
+        tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+    assert reader.get() == {'breakfast': tag.bit}
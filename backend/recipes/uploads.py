@@ -0,0 +1,137 @@
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from .models import Upload
+
+
+class UploadError(Exception):
+    '''Ошибка приема загрузки.'''
+
+
+class UploadOffsetError(UploadError):
+    '''Смещение части не совпадает с уже принятым объемом.'''
+
+
+def get_upload_path(upload):
+    return os.path.join(settings.UPLOAD_TEMP_DIR, upload.pk.hex)
+
+
+def check_size(size):
+    if size > settings.UPLOAD_MAX_SIZE:
+        raise UploadError(
+            f'Размер файла превышает {settings.UPLOAD_MAX_SIZE} байт.'
+        )
+
+
+def write_chunks(upload, chunks):
+    '''Дописывание частей в файл с позиции upload.offset.
+    Хвост прерванной ранее записи отбрасывается.
+    '''
+    os.makedirs(settings.UPLOAD_TEMP_DIR, exist_ok=True)
+    received = 0
+    with open(get_upload_path(upload), 'ab') as file:
+        file.truncate(upload.offset)
+        for chunk in chunks:
+            file.write(chunk)
+            received += len(chunk)
+    return received
+
+
+def read_stream(stream, length):
+    '''Чтение тела запроса частями по UPLOAD_CHUNK_SIZE байт.'''
+    while length > 0:
+        chunk = stream.read(min(settings.UPLOAD_CHUNK_SIZE, length))
+        if not chunk:
+            return
+        length -= len(chunk)
+        yield chunk
+
+
+def get_image_format(upload):
+    '''Формат полностью принятого файла или пустая строка,
+    если файл не является изображением допустимого формата.
+    '''
+    try:
+        with Image.open(get_upload_path(upload)) as image:
+            image_format = image.format
+            image.verify()
+    except Exception:
+        return ''
+    if image_format not in settings.UPLOAD_IMAGE_FORMATS:
+        return ''
+    return image_format.lower()
+
+
+def finish_upload(upload):
+    image_format = get_image_format(upload)
+    if not image_format:
+        upload.delete()
+        raise UploadError('Загрузите корректное изображение.')
+    upload.image_format = image_format
+    upload.completed = True
+    upload.save(update_fields=('image_format', 'completed'))
+
+
+def create_upload_from_file(user, uploaded_file):
+    '''Загрузка файла, принятого целиком из multipart-запроса.'''
+    check_size(uploaded_file.size)
+    upload = Upload.objects.create(user=user, size=uploaded_file.size)
+    upload.offset = write_chunks(
+        upload, uploaded_file.chunks(settings.UPLOAD_CHUNK_SIZE)
+    )
+    finish_upload(upload)
+    return upload
+
+
+def append_chunk(upload, stream, offset, length):
+    '''Дописывание части возобновляемой загрузки из потока запроса.
+    Часть пишется прямо во временный файл, не накапливаясь в памяти.
+    '''
+    with transaction.atomic():
+        upload = Upload.objects.select_for_update().get(pk=upload.pk)
+        if upload.completed or offset != upload.offset:
+            raise UploadOffsetError(
+                f'Ожидается часть со смещения {upload.offset}.'
+            )
+        if offset + length > upload.size:
+            raise UploadError('Часть выходит за пределы размера загрузки.')
+        upload.offset += write_chunks(upload, read_stream(stream, length))
+        upload.save()
+    if upload.offset == upload.size:
+        finish_upload(upload)
+    return upload
+
+
+def open_upload(upload):
+    '''Файл завершенной загрузки для присвоения полю изображения.'''
+    extension = 'jpg' if upload.image_format == 'jpeg' else (
+        upload.image_format
+    )
+    return File(
+        open(get_upload_path(upload), 'rb'),
+        name=f'{upload.pk.hex}.{extension}',
+    )
+
+
+def remove_upload_file(upload):
+    try:
+        os.remove(get_upload_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def purge_uploads():
+    '''Удаление загрузок старше UPLOAD_EXPIRE_HOURS.'''
+    expired = Upload.objects.filter(
+        created_at__lt=timezone.now() - timedelta(
+            hours=settings.UPLOAD_EXPIRE_HOURS
+        )
+    )
+    deleted, _ = expired.delete()
+    return deleted
@@ -1,14 +1,17 @@
 from django.contrib import admin
 
+from recipes.admin import DeferredDeletionAdmin
+from recipes.deletion import delete_user
 from .models import User, Subscription
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(DeferredDeletionAdmin):
     list_display = ('id', 'email', 'username', 'first_name',
                     'last_name')
     search_fields = ('username', 'email')
     list_filter = ('username', 'email')
+    delete_function = staticmethod(delete_user)
 
 
 @admin.register(Subscription)
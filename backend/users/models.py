@@ -1,4 +1,4 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
 
 from .validators import UsernameValidator
@@ -8,6 +8,13 @@ MAX_NAME_LENGTH = 150
 HELP_TEXT = 'Обязательное поле для заполнения'
 
 
+class ActiveUserManager(UserManager):
+    '''Менеджер пользователей, скрывающий удаленные аккаунты.'''
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class User(AbstractUser):
     email = models.EmailField(
         'Адрес электронной почты',
@@ -52,6 +59,14 @@ class User(AbstractUser):
         upload_to='user_images/',
         blank=True,
     )
+    deleted_at = models.DateTimeField(
+        'Дата удаления',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
+    objects = ActiveUserManager()
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -61,6 +76,31 @@ class User(AbstractUser):
     def __str__(self):
         return f'Ник:{self.username}, Почта:{self.email}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        user._loaded_values = dict(zip(field_names, values))
+        return user
+
+    def get_changed_fields(self, names):
+        '''Поля из names, значения которых отличаются от загруженных
+        из базы. Для объекта, созданного не из базы, - все поля.
+        '''
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return set(names)
+        changed = set()
+        for name in names:
+            field = self._meta.get_field(name)
+            if field.attname not in loaded:
+                if field.attname in self.__dict__:
+                    changed.add(name)
+            elif field.get_prep_value(
+                getattr(self, field.attname)
+            ) != loaded[field.attname]:
+                changed.add(name)
+        return changed
+
 
 class Subscription(models.Model):
     user = models.ForeignKey(